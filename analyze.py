@@ -0,0 +1,227 @@
+"""
+Analysis command line interface for the stats files generated by benchmark.py, with on-disk caching.
+
+Subcommands:
+    profile: performance profile of the schemes over all given stats files (see performance_profile.py)
+    table: the numbers and LaTeX data tables of process_stats.py for each stats file
+    summary: number of runs, success rate and median time and iterations of each scheme for each stats file
+
+Slow imports such as NumPy and matplotlib are only made when needed, and the results are cached in cache_dir, keyed by
+the hashes of the stats and extras files and the parameters.
+
+Usage:
+    python analyze.py profile stats/stats_car_10 stats/stats_ccpp_30 stats/stats_dist_30 --output profile.png
+    python analyze.py table stats/stats_ccpp_30 --latex
+    python analyze.py summary stats/stats_*
+"""
+
+######################################################## Setup #########################################################
+cache_dir = ".analysis_cache" # Directory of cached results
+report_taus = [1., 1.25, 1.5, 2., 5., 10.] # Values of tau at which the profile subcommand prints rho
+########################################################################################################################
+
+import os
+import sys
+import pickle
+import hashlib
+import argparse
+import tempfile
+import stats_io
+
+cache_version = 2 # Increase when the cached results change, to invalidate old caches
+
+def file_hash(file_name):
+    sha1 = hashlib.sha1()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def cache_key(command, file_names, parameters):
+    """Return the cache key of command on file_names with the given parameters (a dict)."""
+    sha1 = hashlib.sha1()
+    sha1.update(repr((cache_version, command, sorted(parameters.items()))).encode('utf-8'))
+    for file_name in file_names:
+        sha1.update(file_hash(file_name).encode('utf-8'))
+        extras_file_name = file_name + stats_io.extras_suffix
+        if os.path.exists(extras_file_name):
+            sha1.update(file_hash(extras_file_name).encode('utf-8'))
+    return sha1.hexdigest()
+
+def cached(command, file_names, parameters, compute, use_cache=True):
+    """
+    Return the result of compute() from the cache, or compute and cache it. The result should consist of built-in types
+    only, so that reading it does not require NumPy.
+    """
+    if not use_cache:
+        return compute()
+    file_name = os.path.join(cache_dir, '%s_%s' % (command, cache_key(command, file_names, parameters)))
+    if os.path.exists(file_name):
+        with open(file_name, "rb") as f:
+            return pickle.load(f)
+    result = compute()
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    # Write to a temporary file first, so that concurrent readers never see a partial cache file
+    (fd, tmp_file_name) = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(result, f, 2)
+    os.rename(tmp_file_name, file_name)
+    return result
+
+### Profile ###
+def stats_files(file_names):
+    """Return file_names without the extras files, which globs such as stats/stats_* also match."""
+    return [file_name for file_name in file_names if not file_name.endswith(stats_io.extras_suffix)]
+
+def _problem_files(file_names):
+    """Return {problem: file name}, raising ValueError if several files are of the same problem."""
+    import stats_db
+    files = {}
+    for file_name in stats_files(file_names):
+        info = stats_db.parse_file_name(file_name)
+        problem = info['problem'] if info is not None else os.path.basename(file_name)
+        if problem in files:
+            raise ValueError("Several stats files of %s: %s and %s." % (problem, files[problem], file_name))
+        files[problem] = file_name
+    return files
+
+def compute_profile(file_names, time_estimate="time", amortize_setup=None, n_tau=100):
+    """
+    Compute the performance profile of the stats files and return a dict with the common schemes, n_p, taus, rho and
+    report, the rho at report_taus.
+    """
+    import numpy as np
+    import performance_profile as pp
+    statses = pp.add_scheme_equalities(pp.load_statses(_problem_files(file_names), time_estimate, amortize_setup))
+    schemes = [pp.schemes[i] for i in pp.scheme_idxs if all(pp.schemes[i] in statses[problem] for problem in statses)]
+    (r, n_p) = pp.performance_ratios(statses, schemes)
+    taus = np.logspace(0, 2, n_tau)
+    curves = pp.rho_curves(r, n_p, schemes, taus)
+    report = pp.rho_curves(r, n_p, schemes, np.array(report_taus))
+    return {'schemes': schemes, 'n_p': int(n_p), 'taus': taus.tolist(),
+            'curves': dict((scheme, curves[scheme].tolist()) for scheme in schemes),
+            'report': dict((scheme, report[scheme].tolist()) for scheme in schemes)}
+
+def print_profile(profile):
+    print('%d instances' % profile['n_p'])
+    print('%-8s' % "Scheme" + "".join(' %8s' % ('%g' % tau) for tau in report_taus))
+    for scheme in profile['schemes']:
+        print('%-8s' % scheme + "".join(' %8.3f' % value for value in profile['report'][scheme]))
+
+def plot_profile(profile, output=None, show=False):
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import performance_profile as pp
+    idxs = [pp.schemes.index(scheme) for scheme in profile['schemes']]
+    scheme_colors = pp.get_scheme_colors()
+    pp.plot_curves(profile['taus'], profile['curves'], profile['schemes'], [pp.scheme_labels[i] for i in idxs],
+                   [scheme_colors[i] for i in idxs], [pp.scheme_styles[i] for i in idxs])
+    if output is not None:
+        plt.savefig(output)
+    if show:
+        plt.show()
+
+### Table and summary ###
+def compute_table(file_name, time_estimate="time"):
+    """Return the tables of process_stats.py of each problem in a stats file, as {problem: table}."""
+    import process_stats
+    stats = stats_io.read_stats(file_name)
+    extras = stats_io.read_extras(file_name)
+    return dict((problem, process_stats.problem_table(stats_io.drop_lost(
+                        stats_io.robust_stats(stats[problem], extras['runs'].get(problem, {}), time_estimate))))
+                for problem in stats)
+
+def _median(values):
+    values = sorted(values)
+    n = len(values)
+    if n == 0:
+        return float('nan')
+    return 0.5*(values[(n - 1)//2] + values[n//2])
+
+def compute_summary(file_name, time_estimate="time"):
+    """
+    Return {problem: {scheme: (runs, success rate, median time, median iterations)}} of a stats file, with the medians
+    over the successful runs.
+    """
+    stats = stats_io.read_stats(file_name)
+    extras = stats_io.read_extras(file_name)
+    summary = {}
+    for problem in stats:
+        prb_stats = stats_io.robust_stats(stats[problem], extras['runs'].get(problem, {}), time_estimate)
+        prb_stats = stats_io.drop_lost(prb_stats)
+        summary[problem] = {}
+        for scheme in prb_stats:
+            success = [run for run in prb_stats[scheme] if run[0] == "Solve_Succeeded"]
+            n_runs = len(prb_stats[scheme])
+            summary[problem][scheme] = (n_runs, float(len(success))/n_runs if n_runs > 0 else float('nan'),
+                                        _median([run[3] for run in success]), _median([run[1] for run in success]))
+    return summary
+
+def print_summary(file_name, summary):
+    import process_stats
+    for problem in sorted(summary):
+        print("\n%s (%s)\n----------------------------" % (problem, file_name))
+        print('%-8s %6s %8s %10s %8s' % ("Scheme", "Runs", "Success", "Time [s]", "Iter"))
+        for scheme in process_stats.sorted_schemes(summary[problem].keys()):
+            (n_runs, success_rate, median_time, median_iter) = summary[problem][scheme]
+            print('%-8s %6d %7.1f%% %10.3f %8.1f' % (scheme, n_runs, 100*success_rate, median_time, median_iter))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analysis of benchmark.py stats files, with caching.")
+    subparsers = parser.add_subparsers(dest='command')
+    profile_parser = subparsers.add_parser('profile', help="performance profile over all files")
+    table_parser = subparsers.add_parser('table', help="process_stats.py numbers for each file")
+    summary_parser = subparsers.add_parser('summary', help="short summary of each file")
+    for sub_parser in [profile_parser, table_parser, summary_parser]:
+        sub_parser.add_argument('files', nargs='+')
+        sub_parser.add_argument('--time-estimate', default="time", choices=["time", "min", "median"])
+        sub_parser.add_argument('--no-cache', action='store_true', help="recompute without reading or writing cache")
+    profile_parser.add_argument('--amortize-setup', type=int, default=None,
+                                help="add the setup time amortized over this many solves")
+    profile_parser.add_argument('--n-tau', type=int, default=100)
+    profile_parser.add_argument('--output', default=None, help="save the plot of the profile to this file")
+    profile_parser.add_argument('--show', action='store_true', help="show the plot of the profile")
+    table_parser.add_argument('--latex', action='store_true', help="also print the LaTeX tables")
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    use_cache = not args.no_cache
+    args.files = stats_files(args.files)
+    if len(args.files) == 0:
+        parser.error("only extras files given, give their stats files instead")
+
+    if args.command == 'profile':
+        try:
+            _problem_files(args.files)
+        except ValueError as e:
+            parser.error(str(e))
+        parameters = {'time_estimate': args.time_estimate, 'amortize_setup': args.amortize_setup,
+                      'n_tau': args.n_tau, 'report_taus': tuple(report_taus), 'files': tuple(args.files)}
+        profile = cached('profile', args.files, parameters,
+                         lambda: compute_profile(args.files, args.time_estimate, args.amortize_setup, args.n_tau),
+                         use_cache)
+        print_profile(profile)
+        if args.output is not None or args.show:
+            plot_profile(profile, args.output, args.show)
+    elif args.command == 'table':
+        import process_stats
+        for file_name in args.files:
+            tables = cached('table', [file_name], {'time_estimate': args.time_estimate},
+                            lambda: compute_table(file_name, args.time_estimate), use_cache)
+            for problem in sorted(tables):
+                process_stats.print_problem_table(problem, tables[problem])
+                if args.latex:
+                    print(process_stats.latex_table(problem, tables[problem]))
+    elif args.command == 'summary':
+        for file_name in args.files:
+            summary = cached('summary', [file_name], {'time_estimate': args.time_estimate},
+                             lambda: compute_summary(file_name, args.time_estimate), use_cache)
+            print_summary(file_name, summary)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,8 @@ process_stats.py script to print some numbers.
 Running all schemes on all six problems simultaneously requires a lot of RAM (more than 32 GB). It is thus recommended
 to only run a single problem at a time. Some parts of the scripts support multiple problems simultaneously, but other do
 not. It is however possible (and recommended) to run multiple Python instances simultaneously, each with its own
-problem.
+problem. The distributed.py script can also be used to spread the runs of a problem over several processes and compute
+nodes.
 
 Note that the scripts refer to the scheme with tearing and without sparsity preservation as scheme 3, instead of 2, and
 vice versa. The numbering in the performance profile legend are however consistent with the publications.
@@ -20,66 +21,246 @@ vice versa. The numbering in the performance profile legend are however consiste
 n_runs = 10 # Number of instances per problem
 old_stats_file = None # Set an old stats file to continue appending results to it
 problems = ["dist"] # Possible values: car, ccpp, double_pendulum, fourbar1, dist
+n_repeats = 1 # Number of times to solve each successfully solved instance, to reduce timing noise
+pin_cpu = None # Core to pin the benchmark process to (its processes if run in parallel), or None to not pin it
+outlier_threshold = 3. # Repeats deviating more than this many (scaled) MADs from the median are rerun (n_repeats >= 3)
+max_reruns = 3 # Maximum number of discarded repeats and outlier reruns per instance (outliers need n_repeats >= 3)
+scaling_study = False # Run the scaling study over n_e and n_cp instead of the benchmark
+scaling_runs = 5 # Number of instances per discretization in the scaling study
+scaling_factors = [0.25, 0.5, 1., 2., 4.] # Factors by which the scaling study scales the default n_e of each problem
+scaling_n_cp = [None] # Values of n_cp in the scaling study, where None is the default of each problem
+sweep_study = False # Run the perturbation sweep over sweep_std_devs instead of the benchmark
+sweep_runs = 50 # Number of instances per standard deviation in the perturbation sweep
+# Standard deviations of the initial state perturbations in the sweep. Use whole percents to get distinct file names.
+sweep_std_devs = {"car": [0.05, 0.1, 0.2, 0.3, 0.4],
+                  "ccpp": [0.1, 0.2, 0.3, 0.45, 0.6],
+                  "double_pendulum": [0.1, 0.2, 0.3, 0.45, 0.6],
+                  "fourbar1": [0.01, 0.02, 0.03, 0.05, 0.08],
+                  "dist": [0.1, 0.2, 0.3, 0.45, 0.6]}
+stats_only = False # Only solve the NLP, without the result object of optimize(), if the collocator supports it
+dump_instances = [] # Instances whose result trajectories are saved, from their first solve with optimize()
+backend = "jmodelica" # "jmodelica", or "replay" to replay recorded solver statistics instead of solving, see replay.py
+record_structure = True # Record the NLP dimensions, sparsity and BLT block sizes of each scheme at setup
+profile_solves = False # Sample the Python stack and time the phases of each solve, see profiler.py
+profile_top_n = 20 # Number of functions in the printed hot-function table of each scheme
+option_factors = None # List of (IPOPT option, levels) to benchmark every option set of a design of, or None
+option_design = "full" # Design of option_factors: "full" factorial or two-level "fractional" factorial
+n_procs = 1 # Number of option sets or sweep levels to run in parallel processes, pinned to cores from pin_cpu
 ########################################################################################################################
 
 try:
     import pyjmi
     import pymodelica
     import pyfmi
+    from pyjmi.symbolic_elimination import BLTOptimizationProblem, EliminationOptions
+    from pyjmi import transfer_optimization_problem, get_files_path
+    from pyjmi.optimization.casadi_collocation import BlockingFactors
+    from pymodelica import compile_fmu
+    from pyfmi import load_fmu
+    from pyjmi.common.io import ResultDymolaTextual
+    from pyjmi.optimization.casadi_collocation import LocalDAECollocationAlgResult
 except ImportError:
-    raise ImportError('Unable to find JModelica.org installation.')
-from pyjmi.symbolic_elimination import BLTOptimizationProblem, EliminationOptions
-from pyjmi import transfer_optimization_problem, get_files_path
-from pyjmi.optimization.casadi_collocation import BlockingFactors
-from pymodelica import compile_fmu
-from pyfmi import load_fmu
+    # Allow importing the benchmark settings (as distributed.py does) without JModelica.org
+    pyjmi = None
 import os
-from pyjmi.common.io import ResultDymolaTextual
-from pyjmi.optimization.casadi_collocation import LocalDAECollocationAlgResult
 import time
+import multiprocessing
 import numpy as np
 import scipy.io as sio
-from itertools import izip
 import pickle
+import stats_io
+import memory
+import nlp_metrics
+import profiler
+import option_sets
+import replay
 
 # Specify schemes for each problem
-schemes = {}
-if "car" in problems:
-    schemes["car"] = ["0", "1", "2.05"]
-if "ccpp" in problems:
-    schemes["ccpp"] = ["0", "1", "2.05", "3", "4.05"]
-if "double_pendulum" in problems:
-    schemes['double_pendulum'] = ["0", "1", "2.05", "3", "4.05", "4.10"]
-if "fourbar1" in problems:
-    schemes['fourbar1'] = ["0", "1", "2.05", "2.10", "2.20", "3",
-                           "4.05", "4.10", "4.20", "4.30", "4.40"]
-if "dist" in problems:
-    schemes['dist'] = ["0", "1", "2.05", "2.10", "2.20", "2.30", "2.40",
-                       "3", "4.05", "4.10", "4.20", "4.30", "4.40"]
-
-# Load existing stats file
-if old_stats_file is None:
-    stats = {}
-    for problem in problems:
-        stats[problem] = dict([(scheme, []) for scheme in schemes[problem]])
-else:
-    stats = pickle.load(open(old_stats_file, "rb"))
-    for problem in problems:
-        if problem in stats:
-            for scheme in stats[problem].keys():
-                if scheme not in schemes[problem]:
-                    del stats[problem][scheme]
-        else:
-            stats[problem] = dict([(scheme, []) for scheme in schemes[problem]])
+schemes = {"car": ["0", "1", "2.05"],
+           "ccpp": ["0", "1", "2.05", "3", "4.05"],
+           "double_pendulum": ["0", "1", "2.05", "3", "4.05", "4.10"],
+           "fourbar1": ["0", "1", "2.05", "2.10", "2.20", "3",
+                        "4.05", "4.10", "4.20", "4.30", "4.40"],
+           "dist": ["0", "1", "2.05", "2.10", "2.20", "2.30", "2.40",
+                    "3", "4.05", "4.10", "4.20", "4.30", "4.40"]}
+
+# Standard deviation of the initial state perturbations for each problem
+std_dev = {"car": 0.1, "ccpp": 0.3, "double_pendulum": 0.3, "fourbar1": 0.03, "dist": 0.3}
+
+# Collocation discretization for each problem. For dist, a global discretization with n_e = 1 and n_cp = 25 can also
+# be used. For car, n_e must be a multiple of 4 because of the blocking factors.
+discretizations = {"car": {'n_e': 60},
+                   "ccpp": {'n_e': 40, 'n_cp': 4},
+                   "double_pendulum": {'n_e': 100},
+                   "fourbar1": {'n_e': 60},
+                   "dist": {'n_e': 20}}
 
-### For each problem, set options and compile ###
 ops = {}
 solvers = {}
 n_algs = {}
-std_dev = {}
 init_res = {}
-for problem in problems:
-    opt_opts = {}
+fmus = {}
+x_vars = {}
+setup_info = {}
+nominal_x0 = {} # problem: nominal initial state, from the solution in sols
+profiles = {} # (problem, scheme): collapsed stacks
+
+def load_stats(problems, old_stats_file=None):
+    """
+    Create empty stats and extras for problems, or load them from old_stats_file and keep only the schemes still in
+    use.
+    """
+    if old_stats_file is None:
+        stats = {}
+        for problem in problems:
+            stats[problem] = dict([(scheme, []) for scheme in schemes[problem]])
+        extras = stats_io.new_extras()
+    else:
+        stats = stats_io.read_stats(old_stats_file)
+        extras = stats_io.read_extras(old_stats_file)
+        for problem in problems:
+            if problem in stats:
+                for scheme in list(stats[problem].keys()):
+                    if scheme not in schemes[problem]:
+                        del stats[problem][scheme]
+            else:
+                stats[problem] = dict([(scheme, []) for scheme in schemes[problem]])
+    return (stats, stats_io.align_extras(extras, stats))
+
+def save_stats(stats, extras, problem, directory="stats", tag=None, std=None):
+    """Pickle stats and extras to a new timestamped stats file for problem and return its name."""
+    if std is None:
+        std = std_dev[problem]
+    name = '%s_%d' % (problem, int(round(100*std)))
+    if tag is not None:
+        name += '_' + tag
+    file_name = os.path.join(directory, 'stats_%s_%d' % (name, int(time.time())))
+    stats_io.write_stats(file_name, stats, extras)
+    return file_name
+
+def pin_to_core(core):
+    """Pin the current process to core and return whether it succeeded."""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, [core])
+        return True
+    try:
+        import psutil
+    except ImportError:
+        print('Unable to pin process to core %d, this requires Python 3.3 or psutil.' % core)
+        return False
+    psutil.Process().cpu_affinity([core])
+    return True
+
+_free_cores = None # Queue of the cores not taken by the processes of a pinned pool, in its processes
+_core = None # Core of this process of a pinned pool
+
+def _init_pinned_process(free_cores):
+    global _free_cores, _core
+    _free_cores = free_cores
+    _core = free_cores.get()
+    try:
+        pin_to_core(_core)
+    except Exception:
+        free_cores.put(_core) # So that the other processes do not wait for it forever
+        raise
+
+def _release_core():
+    """Give the core of this process back to its pinned pool, at the end of its only task."""
+    if _free_cores is not None:
+        _free_cores.put(_core)
+
+def available_cores():
+    """Return the set of cores that the current process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return set(os.sched_getaffinity(0))
+    return set(range(multiprocessing.cpu_count()))
+
+def pinned_pool(context, n_procs):
+    """
+    Return a pool of n_procs single-task processes which, if pin_cpu is set, each pin themselves to a free core from
+    pin_cpu on. The task must then give its core back with _release_core.
+    """
+    if pin_cpu is None:
+        return context.Pool(n_procs, maxtasksperchild=1)
+    cores = [pin_cpu + k for k in range(n_procs)]
+    missing = sorted(set(cores) - available_cores())
+    if len(missing) > 0:
+        raise ValueError("Unable to pin %d processes to the cores %d to %d from pin_cpu, cores %s are not available." %
+                         (n_procs, cores[0], cores[-1], ", ".join(str(core) for core in missing)))
+    free_cores = context.Queue()
+    for core in cores:
+        free_cores.put(core)
+    return context.Pool(n_procs, initializer=_init_pinned_process, initargs=(free_cores,), maxtasksperchild=1)
+
+def elimination_settings(scheme):
+    """Return the pair (dense_tol, tearing) used by scheme, or None for scheme 0 which does not eliminate."""
+    scheme_split = scheme.split('.')
+    if scheme_split[0] == "0":
+        return None
+    if len(scheme_split) > 1:
+        dense_tol = int(scheme_split[1])
+    else:
+        dense_tol = np.inf
+    return (dense_tol, scheme_split[0] in ["3", "4"])
+
+def count_algebraics(op):
+    return len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
+
+def setup_scheme(problem, scheme, class_name, file_paths, compiler_opts, opt_opts, caus_opts):
+    """
+    Transfer, eliminate and prepare the solver of scheme, and store the time and peak memory of each phase and the
+    system sizes in setup_info.
+    """
+    info = {}
+    t0 = time.time()
+    with memory.PeakMemory() as mem:
+        op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
+    info['transfer_time'] = time.time() - t0
+    info['transfer_memory'] = mem.peak
+    info['n_algs_before'] = count_algebraics(op)
+
+    t0 = time.time()
+    with memory.PeakMemory() as mem:
+        settings = elimination_settings(scheme)
+        if settings is not None:
+            (caus_opts['dense_tol'], caus_opts['tearing']) = settings
+            op = BLTOptimizationProblem(op, caus_opts)
+    info['elimination_time'] = time.time() - t0
+    info['elimination_memory'] = mem.peak
+
+    t0 = time.time()
+    with memory.PeakMemory() as mem:
+        solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
+    info['prepare_time'] = time.time() - t0
+    info['prepare_memory'] = mem.peak
+
+    ops[problem][scheme] = op
+    n_algs[problem][scheme] = count_algebraics(op)
+    info['n_algs'] = n_algs[problem][scheme]
+    info['n_eliminated'] = info['n_algs_before'] - info['n_algs']
+    info['n_states'] = len(op.getVariables(op.DIFFERENTIATED))
+    info['total_time'] = info['transfer_time'] + info['elimination_time'] + info['prepare_time']
+    memories = [info[phase + '_memory'] for phase in ['transfer', 'elimination', 'prepare']
+                if info[phase + '_memory'] is not None]
+    info['peak_memory'] = max(memories) if memories else None
+    if record_structure:
+        info.update(nlp_metrics.nlp_structure(solvers[problem][scheme], op))
+    setup_info[problem][scheme] = info
+
+### For each problem, set options and compile ###
+def setup_problem(problem, discretization=None, ipopt_options=None):
+    """
+    Set options, compile and prepare the solvers of all schemes for problem, optionally overriding the discretization
+    and IPOPT options.
+    """
+    if backend == "replay":
+        setup_replay_problem(problem)
+        return
+    if pyjmi is None:
+        raise ImportError('Unable to find JModelica.org installation.')
+    opt_opts = dict(discretizations[problem])
+    if discretization is not None:
+        opt_opts.update(discretization)
     opt_opts['IPOPT_options'] = {}
     opt_opts['IPOPT_options']['acceptable_iter'] = 10000
     opt_opts['IPOPT_options']['acceptable_tol'] = 1e-12
@@ -91,7 +272,6 @@ for problem in problems:
     opt_opts['IPOPT_options']['ma57_automatic_scaling'] = "yes"
     opt_opts['IPOPT_options']['mu_strategy'] = "adaptive"
     if problem == "car":
-        std_dev[problem] = 0.1
         caus_opts = EliminationOptions()
         caus_opts['uneliminable'] = ['car.Fxf', 'car.Fxr', 'car.Fyf', 'car.Fyr']
         class_name = "Turn"
@@ -100,7 +280,6 @@ for problem in problems:
         opt_opts['init_traj'] = init_res[problem]
         opt_opts['nominal_traj'] = init_res[problem]
         opt_opts['IPOPT_options']['max_cpu_time'] = 30
-        opt_opts['n_e'] = 60
 
         # Set blocking factors
         factors = {'delta_u': opt_opts['n_e'] / 2 * [2],
@@ -111,44 +290,8 @@ for problem in problems:
         bf = BlockingFactors(factors, du_bounds=du_bounds)
         opt_opts['blocking_factors'] = bf
 
-        # Set up optimization problems for each scheme
         compiler_opts = {'generate_html_diagnostics': True, 'state_initial_equations': True}
-        ops[problem] = {}
-        solvers[problem] = {}
-        n_algs[problem] = {}
-        dns_tol = 5
-        
-        # Scheme 0
-        scheme = "0"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 1
-        scheme = "1"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.05
-        scheme = "2.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = dns_tol
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
     elif problem == "ccpp":
-        std_dev[problem] = 0.3
         caus_opts = EliminationOptions()
         caus_opts['uneliminable'] = ['plant.sigma']
         caus_opts['tear_vars'] = ['plant.turbineShaft.T__3']
@@ -160,72 +303,12 @@ for problem in problems:
         opt_opts['init_traj'] = init_res[problem]
         opt_opts['nominal_traj'] = init_res[problem]
         opt_opts['IPOPT_options']['max_cpu_time'] = 40
-        opt_opts['n_e'] = 40
-        opt_opts['n_cp'] = 4
         compiler_opts = {'generate_html_diagnostics': True, 'state_initial_equations': True}
 
         # Set up FMU to check initial state feasibility
-        fmu = load_fmu(compile_fmu("CombinedCycleStartup.Startup6Verification", file_paths,
-                                   separate_process=True, compiler_options=compiler_opts))
-
-        # Set up optimization problems for each scheme
-        ops[problem] = {}
-        solvers[problem] = {}
-        n_algs[problem] = {}
-        
-        # Scheme 0
-        scheme = "0"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 1
-        scheme = "1"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.05
-        scheme = "2.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-        
-        # Scheme 3
-        scheme = "3"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.05
-        scheme = "4.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
+        fmus[problem] = load_fmu(compile_fmu("CombinedCycleStartup.Startup6Verification", file_paths,
+                                             separate_process=True, compiler_options=compiler_opts))
     elif problem == "double_pendulum":
-        std_dev[problem] = 0.3
         caus_opts = EliminationOptions()
         caus_opts['tear_vars'] = ['der(pendulum.boxBody1.body.w_a[3])', 'der(pendulum.boxBody2.body.w_a[3])']
         caus_opts['tear_res'] = [43, 44]
@@ -235,81 +318,10 @@ for problem in problems:
                       os.path.join(get_files_path(), "DoublePendulum.mop"))
         compiler_opts = {'generate_html_diagnostics': False, 'inline_functions': 'all', 'dynamic_states': False,
                          'state_initial_equations': False, 'equation_sorting': True, 'automatic_tearing': True}
-        op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
         opt_opts['init_traj'] = init_res[problem]
         opt_opts['nominal_traj'] = init_res[problem]
         opt_opts['IPOPT_options']['max_cpu_time'] = 50
-        opt_opts['n_e'] = 100
-
-        # Set up optimization problems for each scheme
-        ops[problem] = {}
-        solvers[problem] = {}
-        n_algs[problem] = {}
-
-        # Scheme 0
-        scheme = "0"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 1
-        scheme = "1"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.05
-        scheme = "2.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 3
-        scheme = "3"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-        
-        # Scheme 4.05
-        scheme = "4.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-        
-        # Scheme 4.10
-        scheme = "4.10"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 10
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
     elif problem == "fourbar1":
-        std_dev[problem] = 0.03
         caus_opts = EliminationOptions()
         uneliminable = ['fourbar1.j2.s']
         uneliminable += ['fourbar1.j3.frame_a.f[1]', 'fourbar1.b0.frame_a.f[3]']
@@ -329,137 +341,10 @@ for problem in problems:
         class_name = "Opt"
         compiler_opts = {'generate_html_diagnostics': True, 'inline_functions': 'all', 'dynamic_states': False,
                          'state_initial_equations': False}
-        op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-        op.set('finalTime', 1.0)
         opt_opts['init_traj'] = init_res[problem]
         opt_opts['nominal_traj'] = init_res[problem]
         opt_opts['IPOPT_options']['max_cpu_time'] = 30
-        opt_opts['n_e'] = 60
-
-        # Set up optimization problems for each scheme
-        ops[problem] = {}
-        solvers[problem] = {}
-        n_algs[problem] = {}
-
-        # Scheme 0
-        scheme = "0"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 1
-        scheme = "1"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.05
-        scheme = "2.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.10
-        scheme = "2.10"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 10
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-        
-        # Scheme 2.20
-        scheme = "2.20"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 20
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 3
-        scheme = "3"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.05
-        scheme = "4.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-        
-        # Scheme 4.10
-        scheme = "4.10"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 10
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-        
-        # Scheme 4.20
-        scheme = "4.20"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 20
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-        
-        # Scheme 4.30
-        scheme = "4.30"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 30
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.40
-        scheme = "4.40"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 40
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
     elif problem == "dist":
-        std_dev[problem] = 0.3
         caus_opts = EliminationOptions()
         caus_opts['uneliminable'] = ['Dist', 'Bott']
         caus_opts['tear_vars'] = (['Temp[%d]' % i for i in range(1, 43)] + 
@@ -473,178 +358,68 @@ for problem in problems:
         opt_opts['init_traj'] = init_res[problem]
         opt_opts['nominal_traj'] = init_res[problem]
         opt_opts['IPOPT_options']['max_cpu_time'] = 40
-
-        # Local
-        opt_opts['n_e'] = 20
-
-        # Global
-        #~ opt_opts['n_e'] = 1
-        #~ opt_opts['n_cp'] = 25
-        
         compiler_opts = {'generate_html_diagnostics': True, 'state_initial_equations': True}
-
-        # Set up optimization problems for each scheme
-        ops[problem] = {}
-        solvers[problem] = {}
-        n_algs[problem] = {}
-        
-        # Scheme 0
-        scheme = "0"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 1
-        scheme = "1"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.05
-        scheme = "2.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.10
-        scheme = "2.10"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 10
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.20
-        scheme = "2.20"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 20
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.30
-        scheme = "2.30"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 30
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 2.40
-        scheme = "2.40"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 40
-            caus_opts['tearing'] = False
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 3
-        scheme = "3"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = np.inf
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.05
-        scheme = "4.05"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 5
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.10
-        scheme = "4.10"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 10
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.20
-        scheme = "4.20"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 20
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.30
-        scheme = "4.30"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 30
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
-
-        # Scheme 4.40
-        scheme = "4.40"
-        if scheme in schemes[problem]:
-            op = transfer_optimization_problem(class_name, file_paths, compiler_options=compiler_opts)
-            caus_opts['dense_tol'] = 40
-            caus_opts['tearing'] = True
-            op = BLTOptimizationProblem(op, caus_opts)
-            ops[problem][scheme] = op
-            solvers[problem][scheme] = op.prepare_optimization(options=opt_opts)
-            n_algs[problem][scheme] = len([var for var in op.getVariables(op.REAL_ALGEBRAIC) if not var.isAlias()])
     else:
         raise ValueError("Unknown problem %s." % problem)
-
-    # Print algebraics
+    if ipopt_options is not None:
+        opt_opts['IPOPT_options'].update(ipopt_options)
+
+    # Set up optimization problems for each scheme
+    ops[problem] = {}
+    solvers[problem] = {}
+    n_algs[problem] = {}
+    setup_info[problem] = {}
+    for scheme in schemes[problem]:
+        setup_scheme(problem, scheme, class_name, file_paths, compiler_opts, opt_opts, caus_opts)
+
+    # Print algebraics and setup costs
     print("Algebraic variables:")
     for scheme in sorted(n_algs[problem].keys()):
         print('%s: %d' % (scheme, n_algs[problem][scheme]))
     print("\n")
+    print("Setup times (transfer, elimination, preparation, total) [s]:")
+    for scheme in sorted(setup_info[problem].keys()):
+        info = setup_info[problem][scheme]
+        print('%s: %.2f, %.2f, %.2f, %.2f' % (scheme, info['transfer_time'], info['elimination_time'],
+                                              info['prepare_time'], info['total_time']))
+    print("\n")
+    if record_structure:
+        print("NLP structure (variables, constraints, Jacobian nonzeros, Hessian nonzeros, largest block, " +
+              "largest torn block):")
+        for scheme in sorted(setup_info[problem].keys()):
+            info = setup_info[problem][scheme]
+            print('%s: %s, %s, %s, %s, %s, %s' % (scheme, info['n_var'], info['n_con'], info['nnz_jac'],
+                                                  info['nnz_hess'], info['max_block'], info['max_torn_block']))
+        print("\n")
+
+def setup_replay_problem(problem):
+    """Set up replay solvers for all schemes of problem, see replay.py."""
+    model = replay.fit(replay.stats_files[problem])
+    ops[problem] = {}
+    solvers[problem] = {}
+    n_algs[problem] = {}
+    setup_info[problem] = {}
+    for scheme in schemes[problem]:
+        if scheme not in model:
+            raise ValueError("Scheme %s of %s is missing in %s." % (scheme, problem, replay.stats_files[problem]))
+        solvers[problem][scheme] = replay.ReplaySolver(model[scheme], replay.load, replay.time_scale,
+                                                       replay.time_noise)
+        setup_info[problem][scheme] = replay.setup_info()
 
 ### Execute ###
-for problem in problems:
-    # Perturb initial state
+def generate_instances(problem, n_runs, std=None):
+    """Generate the perturbed initial states of the first n_runs instances of problem, the same in every process."""
+    if std is None:
+        std = std_dev[problem]
+    if backend == "replay":
+        return replay.generate_instances(n_runs)
     np.random.seed(1)
-    op0 = ops[problem].values()[0] # Get arbitrary OP to compute min and max
-    x_vars = op0.getVariables(op.DIFFERENTIATED)
-    x_names = [x_var.getName() for x_var in x_vars]
-    x0 = [init_res[problem].initial(var.getName()) for var in x_vars]
-    [x_min, x_max] = zip(*[(op0.get_attr(var, "min"), op0.get_attr(var, "max")) for var in x_vars])
+    op0 = list(ops[problem].values())[0] # Get arbitrary OP to compute min and max
+    x_vars[problem] = op0.getVariables(op0.DIFFERENTIATED)
+    x_names = [x_var.getName() for x_var in x_vars[problem]]
+    x0 = [init_res[problem].initial(var.getName()) for var in x_vars[problem]]
+    nominal_x0[problem] = [float(val) for val in x0]
+    [x_min, x_max] = zip(*[(op0.get_attr(var, "min"), op0.get_attr(var, "max")) for var in x_vars[problem]])
     if problem == "dist":
         x_min = tuple(42*[0.])
         x_max = tuple(42*[1.])
@@ -652,18 +427,18 @@ for problem in problems:
     x0_pert_max = []
 
     # Move perturbations inside of bounds
-    for (var_nom, var_min, var_max) in izip(x0, x_min, x_max):
+    for (var_nom, var_min, var_max) in zip(x0, x_min, x_max):
         x0_pert_min.append(var_nom - 0.9*(var_nom-var_min))
         x0_pert_max.append(var_nom + 0.9*(var_max-var_nom))
 
-    # Solve
-    for i in xrange(n_runs):
+    instances = []
+    for i in range(n_runs):
         x0_pert = x0
         feasible = False
         while not feasible:
-            x0_pert = np.random.normal(1, std_dev[problem], len(x0)) * x0
+            x0_pert = np.random.normal(1, std, len(x0)) * x0
             x0_pert_proj = [min(max(val, val_min), val_max)
-                            for (val, val_min, val_max) in izip(x0_pert, x0_pert_min, x0_pert_max)]
+                            for (val, val_min, val_max) in zip(x0_pert, x0_pert_min, x0_pert_max)]
             if problem == "car":
                 X = x0_pert_proj[3]
                 if X > 35.:
@@ -671,6 +446,7 @@ for problem in problems:
                 else:
                     feasible = False
             elif problem == "ccpp":
+                fmu = fmus[problem]
                 fmu.reset()
                 fmu.set(['_start_' + name for name in  x_names], x0_pert_proj)
                 try:
@@ -685,25 +461,356 @@ for problem in problems:
                         feasible = False
             else:
                 feasible = True
+        instances.append(x0_pert_proj)
+    return instances
+
+def applied_state(problem, x0_pert_proj):
+    """Return the values of an initial state that set_initial_state applies to the solvers of problem."""
+    if backend != "replay" and problem in ["fourbar1", "double_pendulum"]:
+        return [float(x0_pert_proj[0]), float(x0_pert_proj[1])]
+    return [float(val) for val in x0_pert_proj]
+
+def record_instances(extras, problem, instances):
+    """
+    Store the applied initial states of instances and the nominal initial state of problem in extras, for selector.py,
+    keeping those already stored for more instances.
+    """
+    if len(instances) >= len(extras['instances'].get(problem, [])):
+        extras['instances'][problem] = [applied_state(problem, x0) for x0 in instances]
+    if problem in nominal_x0:
+        extras['nominal'][problem] = applied_state(problem, nominal_x0[problem])
+
+def solve_phases(solver, res, optimize_time):
+    """
+    Split the time of a solve into the phases optimize, ipopt, nlp_eval and overhead, leaving out those without timers.
+    """
+    phases = {'optimize': optimize_time}
+    try:
+        nlp_stats = solver.collocator.solver_object.getStats()
+        nlp_eval = sum(nlp_stats[key] for key in nlp_stats if key.startswith('t_eval_'))
+        phases['nlp_eval'] = nlp_eval
+        phases['ipopt'] = nlp_stats['t_mainloop'] - nlp_eval
+        phases['overhead'] = optimize_time - nlp_stats['t_mainloop']
+    except Exception:
+        pass
+    times = getattr(res, 'times', None)
+    if times is None:
+        times = getattr(getattr(solver, 'collocator', None), 'times', {})
+    for (key, value) in times.items():
+        phases['jmodelica_' + key] = value
+    return phases
+
+def set_initial_state(problem, solver, x0_pert_proj):
+    # Only the first two states of fourbar1 and double_pendulum are applied, see applied_state
+    if backend == "replay":
+        solver.set('instance', x0_pert_proj)
+    elif problem == "fourbar1":
+        solver.set('phi_start', x0_pert_proj[0])
+        solver.set('w_start', x0_pert_proj[1])
+    elif problem == "double_pendulum":
+        solver.set('phi1_start', x0_pert_proj[0])
+        solver.set('w1_start', x0_pert_proj[1])
+        solver.set('phi2_start', x0_pert_proj[0])
+        solver.set('w2_start', x0_pert_proj[1])
+    else:
+        solver.set(['_start_' + var.getName() for var in x_vars[problem]], x0_pert_proj)
+
+def solves_nlp_only(solver):
+    """Return whether the collocator of solver has the internal methods used to only solve the NLP."""
+    collocator = getattr(solver, 'collocator', None)
+    return hasattr(collocator, 'solve_nlp') and hasattr(collocator, 'get_solver_statistics')
+
+def solve_statistics(solver, keep_result=False):
+    """
+    Solve the NLP of a prepared solver and return its statistics (status, iterations, cost, time) and the result of
+    optimize(), or None if only the NLP was solved, which is done if stats_only is set and keep_result is not.
+    """
+    if stats_only and not keep_result and solves_nlp_only(solver):
+        solver.collocator.solve_nlp()
+        return (solver.collocator.get_solver_statistics(), None)
+    res = solver.optimize()
+    return (res.get_solver_statistics(), res)
+
+def solve(problem, scheme, x0_pert_proj, keep_result=False):
+    """
+    Solve an instance of problem and return its statistics, its phases if profile_solves is set and its result, if kept.
+    """
+    solver = solvers[problem][scheme]
+    set_initial_state(problem, solver, x0_pert_proj)
+    if not profile_solves:
+        (stats, res) = solve_statistics(solver, keep_result)
+        return (stats, None, res)
+    t0 = time.time()
+    with profiler.SamplingProfiler(profiles.setdefault((problem, scheme), {})):
+        (stats, res) = solve_statistics(solver, keep_result)
+    phases = solve_phases(solver, res, time.time() - t0)
+    return (stats, phases, res)
+
+def dump_trajectories(problem, scheme, instance, x0_pert_proj, res, directory="stats"):
+    """
+    Pickle the trajectories of the result res of an instance, with its initial state and statistics, to a new trajectory
+    file and return its name.
+    """
+    names = getattr(getattr(res, 'result_data', None), 'name', [])
+    dump = {'problem': problem, 'scheme': scheme, 'instance': instance, 'x0': list(x0_pert_proj),
+            'stats': res.get_solver_statistics(),
+            'trajectories': dict((name, np.array(res[name])) for name in names)}
+    file_name = os.path.join(directory, 'trajectories_%s_%s_%d_%d' % (problem, scheme, instance, int(time.time())))
+    pickle.dump(dump, open(file_name, "wb"))
+    return file_name
+
+def measure(problem, scheme, x0_pert_proj, dump_instance=None, directory="stats"):
+    """
+    Solve an instance and, if successful, repeat it n_repeats times, rerunning outliers. Return the statistics of the
+    first solve and a run dict with the measured times and phases, or None. The first solve is dumped if dump_instance
+    is given.
+    """
+    (stats, phases, res) = solve(problem, scheme, x0_pert_proj, dump_instance is not None)
+    if dump_instance is not None:
+        dump_trajectories(problem, scheme, dump_instance, x0_pert_proj, res, directory)
+    if n_repeats <= 1 or stats[0] != "Solve_Succeeded":
+        if phases is None:
+            return (stats, None)
+        return (stats, {'phases': phases})
+    times = [stats[3]]
+    n_reruns = 0
+    while len(times) < n_repeats and n_reruns < max_reruns:
+        repeat_stats = solve(problem, scheme, x0_pert_proj)[0]
+        if repeat_stats[0] == stats[0]:
+            times.append(repeat_stats[3])
+        else:
+            n_reruns += 1
+    while n_reruns < max_reruns and len(times) >= 3:
+        median = np.median(times)
+        # Scaled MAD, bounded from below to not rerun repeats that differ by less than a percent
+        mad = max(1.4826*np.median(np.abs(np.array(times) - median)), 0.01*median/outlier_threshold)
+        outliers = [j for j in range(len(times)) if abs(times[j] - median) > outlier_threshold*mad]
+        if len(outliers) == 0:
+            break
+        for j in outliers[:max_reruns-n_reruns]:
+            repeat_stats = solve(problem, scheme, x0_pert_proj)[0]
+            if repeat_stats[0] == stats[0]:
+                times[j] = repeat_stats[3]
+            n_reruns += 1
+    median = np.median(times)
+    run = {'times': times,
+           'time_min': float(np.min(times)),
+           'time_median': float(median),
+           'time_mad': float(np.median(np.abs(np.array(times) - median))),
+           'n_reruns': n_reruns}
+    if phases is not None:
+        run['phases'] = phases
+    return (stats, run)
+
+def compute_dispersion(runs):
+    """Return the median relative run-to-run dispersion (MAD/median) of the solution time of runs, or NaN."""
+    dispersions = [run['time_mad']/run['time_median'] for run in runs
+                   if run is not None and 'time_mad' in run and run['time_median'] > 0]
+    if len(dispersions) == 0:
+        return np.nan
+    return np.median(dispersions)
+
+def scaling_grid(problem):
+    """Return the discretizations of problem in the scaling study, with n_e geometrically scaled from its default."""
+    grid = []
+    multiple = 4 if problem == "car" else 1
+    for n_cp in scaling_n_cp:
+        for factor in scaling_factors:
+            n_e = multiple*int(round(factor*discretizations[problem]['n_e']/multiple))
+            discretization = {'n_e': max(multiple, n_e)}
+            if n_cp is not None:
+                discretization['n_cp'] = n_cp
+            if discretization not in grid:
+                grid.append(discretization)
+    return grid
+
+def run_scaling_study(problem, directory="stats"):
+    """
+    Solve the first scaling_runs instances of problem with all schemes at each discretization of its scaling grid, and
+    return the name of the scaling file, see scaling.py.
+    """
+    file_name = os.path.join(directory, 'scaling_%s_%d_%d' %
+                             (problem, int(round(100*std_dev[problem])), int(time.time())))
+    records = []
+    instances = None
+    for discretization in scaling_grid(problem):
+        setup_problem(problem, discretization)
+        if instances is None:
+            instances = generate_instances(problem, scaling_runs)
+        n_e = discretization['n_e']
+        n_cp = discretization.get('n_cp', discretizations[problem].get('n_cp', 3))
         for scheme in schemes[problem]:
-            if i >= len(stats[problem][scheme]):
-                print('%s, scheme %s: %d/%d' % (problem, scheme, i+1, n_runs))
-                solver = solvers[problem][scheme]
-                if problem == "fourbar1":
-                    solver.set('phi_start', x0_pert_proj[0])
-                    solver.set('w_start', x0_pert_proj[1])
-                elif problem == "double_pendulum":
-                    solver.set('phi1_start', x0_pert_proj[0])
-                    solver.set('w1_start', x0_pert_proj[1])
-                    solver.set('phi2_start', x0_pert_proj[0])
-                    solver.set('w2_start', x0_pert_proj[1])
-                else:
-                    solver.set(['_start_' + var.getName() for var in x_vars], x0_pert_proj)
-                res = solver.optimize()
-                stats[problem][scheme].append(res.get_solver_statistics())
-        if (i+1) >= len(stats[problem][scheme]) and ((i+1) % 50 == 0 or (i+1) in [10, 20, 30, 40]):
-            file_name = 'stats/stats_%s_%d_%d' % (problem, 100*std_dev[problem], int(time.time()))
-            pickle.dump(stats, open(file_name, "wb"))
-    file_name = 'stats/stats_%s_%d_%d' % (problem, 100*std_dev[problem], int(time.time()))
-    pickle.dump(stats, open(file_name, "wb"))
-print(file_name)
+            dims = nlp_metrics.nlp_dimensions(solvers[problem][scheme])
+            for i in range(scaling_runs):
+                print('%s, scheme %s, n_e = %d, n_cp = %d: %d/%d' % (problem, scheme, n_e, n_cp, i+1, scaling_runs))
+                with memory.PeakMemory() as mem:
+                    (run_stats, run) = measure(problem, scheme, instances[i])
+                (status, iter, cost, solve_time) = run_stats
+                record = {'problem': problem, 'scheme': scheme, 'n_e': n_e, 'n_cp': n_cp, 'instance': i,
+                          'status': status, 'iter': iter, 'cost': cost, 'time': solve_time,
+                          'peak_memory': mem.peak, 'memory_increase': mem.increase}
+                record.update(dims)
+                record['setup_time'] = setup_info[problem][scheme]['total_time']
+                if run is not None:
+                    record['time_median'] = run['time_median']
+                records.append(record)
+        pickle.dump(records, open(file_name, "wb"))
+    return file_name
+
+def run_benchmark(problems, n_runs, old_stats_file=None, ipopt_options=None, tag=None, directory="stats"):
+    """Solve n_runs instances of problems with all schemes, appending to old_stats_file, and return the file names."""
+    # Load existing stats file
+    (stats, extras) = load_stats(problems, old_stats_file)
+    extras['options'] = dict(ipopt_options or {})
+    stats_io.add_backend(extras, backend)
+
+    for problem in problems:
+        setup_problem(problem, ipopt_options=ipopt_options)
+        extras['setup'][problem] = setup_info[problem]
+
+    file_names = []
+    for problem in problems:
+        # Perturb initial state
+        instances = generate_instances(problem, n_runs)
+        record_instances(extras, problem, instances)
+
+        # Solve
+        for i in range(n_runs):
+            for scheme in schemes[problem]:
+                if i >= len(stats[problem][scheme]):
+                    print('%s, scheme %s: %d/%d' % (problem, scheme, i+1, n_runs))
+                    (run_stats, run) = measure(problem, scheme, instances[i], i if i in dump_instances else None,
+                                               directory)
+                    stats[problem][scheme].append(run_stats)
+                    extras['runs'][problem][scheme].append(run)
+            if (i+1) >= len(stats[problem][scheme]) and ((i+1) % 50 == 0 or (i+1) in [10, 20, 30, 40]):
+                save_stats(stats, extras, problem, directory, tag)
+
+        # Print run-to-run variance
+        if n_repeats > 1:
+            extras['dispersion'][problem] = {}
+            print("Relative run-to-run time dispersion:")
+            for scheme in schemes[problem]:
+                extras['dispersion'][problem][scheme] = compute_dispersion(extras['runs'][problem][scheme])
+                print('%s: %.3f' % (scheme, extras['dispersion'][problem][scheme]))
+            print("\n")
+        file_names.append(save_stats(stats, extras, problem, directory, tag))
+        if profile_solves:
+            write_profiles(problem, extras, directory)
+    return file_names
+
+def write_profiles(problem, extras, directory="stats"):
+    """
+    Write the collapsed stacks of each scheme of problem to a profile file for flamegraph.pl, and print the median
+    phase times and the hot-function table of each scheme.
+    """
+    for scheme in schemes[problem]:
+        stacks = profiles.get((problem, scheme), {})
+        file_name = os.path.join(directory, 'profile_%s_%s_%d.collapsed' % (problem, scheme, int(time.time())))
+        profiler.write_collapsed(stacks, file_name)
+        print('%s, scheme %s: %s' % (problem, scheme, file_name))
+        runs = [run for run in extras['runs'][problem][scheme] if run is not None and 'phases' in run]
+        for key in ['optimize', 'ipopt', 'nlp_eval', 'overhead']:
+            phase_times = [run['phases'][key] for run in runs if key in run['phases']]
+            if len(phase_times) > 0:
+                print('Median %s time: %.3f s' % (key, np.median(phase_times)))
+        profiler.print_top_functions(stacks, profile_top_n)
+        print("\n")
+
+def run_sweep_level(problem, std, directory="stats"):
+    """
+    Solve the first sweep_runs instances of problem perturbed with the standard deviation std with all schemes, and
+    return the name of the stats file, tagged sweep.
+    """
+    (stats, extras) = load_stats([problem])
+    extras['setup'][problem] = setup_info[problem]
+    extras['std_dev'] = std
+    stats_io.add_backend(extras, backend)
+    instances = generate_instances(problem, sweep_runs, std)
+    record_instances(extras, problem, instances)
+    for i in range(sweep_runs):
+        for scheme in schemes[problem]:
+            print('%s, std_dev %.2f, scheme %s: %d/%d' % (problem, std, scheme, i+1, sweep_runs))
+            (run_stats, run) = measure(problem, scheme, instances[i])
+            stats[problem][scheme].append(run_stats)
+            extras['runs'][problem][scheme].append(run)
+    return save_stats(stats, extras, problem, directory, 'sweep', std)
+
+def _run_sweep_level(args):
+    (problem, std, directory) = args
+    try:
+        return run_sweep_level(problem, std, directory)
+    finally:
+        _release_core()
+
+def run_sweep(problem, directory="stats"):
+    """
+    Run the perturbation sweep of problem over sweep_std_devs[problem], one level per fresh process forked with the
+    solvers set up, and return the file names of the levels.
+    """
+    setup_problem(problem)
+    levels = [(problem, std, directory) for std in sweep_std_devs[problem]]
+    if n_procs <= 1:
+        return [_run_sweep_level(level) for level in levels]
+    if hasattr(multiprocessing, 'get_context'):
+        pool = pinned_pool(multiprocessing.get_context('fork'), n_procs)
+    else:
+        pool = pinned_pool(multiprocessing, n_procs) # Python 2, which always forks
+    try:
+        return pool.map(_run_sweep_level, levels, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def option_design_sets():
+    """Return the option sets of the design of option_factors."""
+    if option_design == "full":
+        return option_sets.full_factorial(option_factors)
+    elif option_design == "fractional":
+        return option_sets.fractional_factorial(option_factors)
+    else:
+        raise ValueError("Unknown option design %s." % option_design)
+
+def _run_option_set(args):
+    (k, options, problems, n_runs, directory) = args
+    try:
+        return run_benchmark(problems, n_runs, ipopt_options=options, tag='opt%d' % k, directory=directory)
+    finally:
+        _release_core()
+
+def run_option_sets(problems, n_runs, directory="stats"):
+    """
+    Benchmark problems with every option set of the design of option_factors, each in a fresh process, and return the
+    names of the stats files, with option set k tagged optk.
+    """
+    design = option_design_sets()
+    for (k, options) in enumerate(design):
+        print('opt%d: %s' % (k, option_sets.option_set_name(options)))
+    print("\n")
+    pool = pinned_pool(multiprocessing, n_procs)
+    try:
+        file_names = pool.map(_run_option_set, [(k, options, problems, n_runs, directory)
+                                                 for (k, options) in enumerate(design)], chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return [file_name for option_file_names in file_names for file_name in option_file_names]
+
+if __name__ == "__main__":
+    # The option sets and parallel sweep levels run in processes pinned to pin_cpu onwards, which must not share their
+    # cores with this process
+    in_pool = not scaling_study and (n_procs > 1 if sweep_study else option_factors is not None)
+    if pin_cpu is not None and not in_pool:
+        pin_to_core(pin_cpu)
+    if n_repeats < 3:
+        print('Outlier reruns are disabled, since they need n_repeats >= 3 (n_repeats = %d).' % n_repeats)
+    if scaling_study:
+        file_names = [run_scaling_study(problem) for problem in problems]
+    elif sweep_study:
+        file_names = [file_name for problem in problems for file_name in run_sweep(problem)]
+    elif option_factors is not None:
+        file_names = run_option_sets(problems, n_runs)
+    else:
+        file_names = run_benchmark(problems, n_runs, old_stats_file)
+    for file_name in file_names:
+        print(file_name)
@@ -0,0 +1,208 @@
+"""
+Detect performance regressions between a baseline and a candidate set of stats files generated with benchmark.py, for
+example before and after upgrading JModelica.org.
+
+The runs are aligned by problem, scheme and instance. For each scheme and each problem as a whole, the time change is
+the geometric mean time ratio candidate/baseline, tested with the Wilcoxon signed-rank test (see head_to_head.py), and
+the success rate change is tested with the exact McNemar test. A change is a regression if it is significant at level
+alpha and larger than time_threshold or success_threshold.
+
+The script exits with status 1 if there is any regression or if the two sets cannot be fully compared, so that it
+can gate upgrades:
+    python compare_stats.py --baseline stats/stats_dist_30_1 --candidate stats/stats_dist_30_2
+The problems are parsed from the file names. Without arguments, the files of the setup section are compared.
+"""
+
+######################################################## Setup #########################################################
+# dicts with problem: stats_file
+baseline_files = {'dist': 'stats/stats_dist_30'}
+candidate_files = {'dist': 'stats/stats_dist_30_0000000000'}
+time_estimate = "time" # Solution time to use: "time" (first solve), or "min" or "median" of repeated solves
+time_threshold = 0.1 # Smallest relative slowdown that is a regression
+success_threshold = 0.02 # Smallest absolute drop of the success rate that is a regression
+alpha = 0.01 # Significance level of the tests
+########################################################################################################################
+
+import sys
+import argparse
+import numpy as np
+from scipy import stats as sp_stats
+import stats_io
+import stats_db
+from head_to_head import wilcoxon_matrix
+
+def load_problem(file_name, problem, time_estimate="time"):
+    """Return the stats of problem in a stats file, {scheme: list}, with the time estimate applied."""
+    stats = stats_io.read_stats(file_name)
+    key = stats_db.problem_key(stats, problem)
+    if key is None:
+        raise ValueError("Problem %s is not in %s." % (problem, file_name))
+    extras = stats_io.read_extras(file_name)
+    return stats_io.robust_stats(stats[key], extras['runs'].get(key, {}), time_estimate)
+
+def load_instances(file_name, problem):
+    """Return the initial states of the instances of problem recorded in the extras of a stats file, or None."""
+    extras = stats_io.read_extras(file_name)
+    key = stats_db.problem_key(extras['instances'], problem) if len(extras['instances']) > 0 else None
+    return extras['instances'][key] if key is not None else None
+
+def alignment_errors(baseline, candidate, instances_b=None, instances_c=None):
+    """
+    Return the reasons why the runs of baseline and candidate ({scheme: list}) cannot be aligned, as a list of strings.
+    """
+    errors = []
+    for (name, stats, other) in [("baseline", baseline, candidate), ("candidate", candidate, baseline)]:
+        missing = sorted(set(other) - set(stats), key=str)
+        if len(missing) > 0:
+            errors.append("schemes %s are not in the %s" % (", ".join(str(scheme) for scheme in missing), name))
+    for scheme in sorted(set(baseline) & set(candidate), key=str):
+        if len(baseline[scheme]) != len(candidate[scheme]):
+            errors.append("scheme %s has %d baseline runs and %d candidate runs" %
+                          (scheme, len(baseline[scheme]), len(candidate[scheme])))
+    if len(baseline) == 0 and len(candidate) == 0:
+        errors.append("no schemes")
+    if instances_b is not None and instances_c is not None:
+        same = len(instances_b) == len(instances_c) and all(np.shape(x_b) == np.shape(x_c) and np.allclose(x_b, x_c)
+                                                            for (x_b, x_c) in zip(instances_b, instances_c))
+        if not same:
+            errors.append("the instances differ")
+    return errors
+
+def aligned_arrays(baseline, candidate):
+    """
+    Return (schemes, times_b, success_b, times_c, success_c) of the aligned runs, with NaN times for failed solves, or
+    raise ValueError if the runs cannot be aligned.
+    """
+    errors = alignment_errors(baseline, candidate)
+    if len(errors) > 0:
+        raise ValueError("Unable to align the runs: %s." % "; ".join(errors))
+    schemes = sorted(baseline)
+    arrays = []
+    for stats in [baseline, candidate]:
+        times = np.array([[run[3] for run in stats[scheme]] for scheme in schemes], dtype=float)
+        success = np.array([[run[0] == "Solve_Succeeded" for run in stats[scheme]] for scheme in schemes],
+                           dtype=bool) & (times > 0)
+        arrays += [np.where(success, times, np.nan), success]
+    return tuple([schemes] + arrays)
+
+def mcnemar(n_lost, n_gained):
+    """Return the two-sided p-values of the exact McNemar test, elementwise for arrays of discordant counts."""
+    n_lost = np.asarray(n_lost)
+    n_gained = np.asarray(n_gained)
+    n = n_lost + n_gained
+    p_values = np.minimum(1., 2*sp_stats.binom.cdf(np.minimum(n_lost, n_gained), n, 0.5))
+    return np.where(n > 0, p_values, 1.)
+
+def _time_change(log_ratios, common):
+    n_common = common.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.exp(np.where(common, log_ratios, 0.).sum(axis=-1) / n_common)
+    return (n_common, ratios, wilcoxon_matrix(log_ratios, common))
+
+def compare(baseline, candidate, time_threshold=0.1, success_threshold=0.02, alpha=0.01):
+    """
+    Compare the stats of a problem and return one row dict per scheme and a last one for the problem as a whole (scheme
+    None), with the time ratio, success rates, p-values and regression flags.
+    """
+    (schemes, times_b, success_b, times_c, success_c) = aligned_arrays(baseline, candidate)
+    common = success_b & success_c
+    log_ratios = np.where(common, np.log(np.where(common, times_c, 1.)) - np.log(np.where(common, times_b, 1.)), 0.)
+    (n_common, ratios, p_time) = _time_change(log_ratios, common)
+    n_lost = (success_b & ~success_c).sum(axis=-1)
+    n_gained = (~success_b & success_c).sum(axis=-1)
+
+    # Problem as a whole, with the log ratios of each instance averaged over the schemes where both succeeded
+    any_common = common.any(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_log_ratios = np.where(any_common, log_ratios.sum(axis=0) / common.sum(axis=0), 0.)
+    (n_common_all, ratio_all, p_time_all) = _time_change(mean_log_ratios[None, :], any_common[None, :])
+
+    n_runs = success_b.shape[1]
+    rows = []
+    for (k, scheme) in enumerate(schemes + [None]):
+        if scheme is None:
+            row = {'scheme': None, 'n_runs': n_runs*len(schemes), 'n_common': n_common_all[0], 'ratio': ratio_all[0],
+                   'p_time': p_time_all[0], 'success_b': success_b.mean(), 'success_c': success_c.mean(),
+                   'p_success': mcnemar(n_lost.sum(), n_gained.sum())}
+        else:
+            row = {'scheme': scheme, 'n_runs': n_runs, 'n_common': n_common[k], 'ratio': ratios[k],
+                   'p_time': p_time[k], 'success_b': success_b[k].mean(), 'success_c': success_c[k].mean(),
+                   'p_success': mcnemar(n_lost[k], n_gained[k])}
+        row['time_regression'] = bool(row['p_time'] < alpha and row['ratio'] > 1. + time_threshold)
+        row['success_regression'] = bool(row['p_success'] < alpha and
+                                         row['success_c'] - row['success_b'] < -success_threshold)
+        rows.append(row)
+    return rows
+
+def print_comparison(problem, rows):
+    print("\n" + problem + "\n----------------------------")
+    print('%-8s %6s %6s %8s %9s %8s %8s %9s  %s' %
+          ("Scheme", "Runs", "Common", "Ratio", "p_time", "Succ. b", "Succ. c", "p_succ", "Regression"))
+    for row in rows:
+        flags = [name for (name, key) in [("time", 'time_regression'), ("success", 'success_regression')] if row[key]]
+        print('%-8s %6d %6d %8.3f %9.2e %7.1f%% %7.1f%% %9.2e  %s' %
+              (row['scheme'] if row['scheme'] is not None else "all", row['n_runs'], row['n_common'], row['ratio'],
+               row['p_time'], 100*row['success_b'], 100*row['success_c'], row['p_success'], ", ".join(flags)))
+
+def _files_by_problem(file_names):
+    files = {}
+    for file_name in file_names:
+        if file_name.endswith(stats_io.extras_suffix):
+            continue
+        info = stats_db.parse_file_name(file_name)
+        if info is None:
+            raise ValueError("Unable to parse the problem from %s." % file_name)
+        if info['problem'] in files:
+            raise ValueError("Several stats files of %s: %s and %s." % (info['problem'], files[info['problem']],
+                                                                         file_name))
+        files[info['problem']] = file_name
+    return files
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect performance regressions between two sets of stats files.")
+    parser.add_argument('--baseline', nargs='+', default=None, help="baseline stats files, one per problem")
+    parser.add_argument('--candidate', nargs='+', default=None, help="candidate stats files, one per problem")
+    parser.add_argument('--time-estimate', default=time_estimate)
+    parser.add_argument('--time-threshold', type=float, default=time_threshold)
+    parser.add_argument('--success-threshold', type=float, default=success_threshold)
+    parser.add_argument('--alpha', type=float, default=alpha)
+    args = parser.parse_args(argv)
+    try:
+        baseline = baseline_files if args.baseline is None else _files_by_problem(args.baseline)
+        candidate = candidate_files if args.candidate is None else _files_by_problem(args.candidate)
+    except ValueError as e:
+        parser.error(str(e))
+
+    regressions = []
+    incomplete = []
+    for problem in sorted(set(baseline) & set(candidate)):
+        baseline_stats = load_problem(baseline[problem], problem, args.time_estimate)
+        candidate_stats = load_problem(candidate[problem], problem, args.time_estimate)
+        errors = alignment_errors(baseline_stats, candidate_stats, load_instances(baseline[problem], problem),
+                                  load_instances(candidate[problem], problem))
+        if len(errors) > 0:
+            print("\n%s: unable to compare, %s" % (problem, "; ".join(errors)))
+            incomplete.append(problem)
+            continue
+        # Leave out the instances lost on either side, to keep the instances aligned
+        lost = stats_io.lost_instances(baseline_stats) | stats_io.lost_instances(candidate_stats)
+        rows = compare(stats_io.drop_lost(baseline_stats, lost), stats_io.drop_lost(candidate_stats, lost),
+                       args.time_threshold, args.success_threshold, args.alpha)
+        print_comparison(problem, rows)
+        regressions += [(problem, row['scheme']) for row in rows
+                        if row['time_regression'] or row['success_regression']]
+    missing = sorted(set(baseline) ^ set(candidate))
+    if len(missing) > 0:
+        print("\nProblems not in both sets: " + ", ".join(missing))
+    if len(incomplete) > 0:
+        print("\nProblems that could not be compared: " + ", ".join(incomplete))
+    if len(regressions) > 0:
+        print("\nRegressions: " + ", ".join('%s scheme %s' % (problem, scheme if scheme is not None else "all")
+                                            for (problem, scheme) in regressions))
+    if len(missing) > 0 or len(incomplete) > 0 or len(regressions) > 0:
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
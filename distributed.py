@@ -0,0 +1,751 @@
+"""
+Distributes the runs of benchmark.py over several worker processes, possibly on different compute nodes.
+
+A coordinator publishes one task per (problem, scheme, instance) missing in the stats to a work queue, either a shared
+directory (for example on NFS, with synchronized clocks) or tcp://host:port served by the coordinator. Workers lease
+tasks, renew their leases with heartbeats and send the solver statistics back. Expired leases are handed out again,
+until a task has lost max_attempts leases and is given up with the status Worker_Lost. The results are saved to stats
+files in the same format as benchmark.py, and a directory queue can be resumed with --resume.
+
+Usage:
+    python distributed.py coordinator --queue /shared/queue --problems dist --n-runs 30
+    python distributed.py worker --queue /shared/queue
+    python distributed.py local --workers 4 --fake-solver
+
+The local command runs a coordinator and several workers on this machine, and can be tried out without JModelica.org
+with --fake-solver or --replay (see replay.py). With --profile, the workers profile their solves and the coordinator
+writes the profiles (see profiler.py).
+"""
+
+##################################################### Queue setup ######################################################
+lease_timeout = 300. # Seconds without heartbeat after which a leased task is handed out again
+max_attempts = 3 # Number of expired leases after which a task is given up with the status Worker_Lost
+heartbeat_interval = 60. # Seconds between heartbeats of a worker
+poll_interval = 1. # Seconds between polls of the queue
+save_interval = 600. # Seconds between saving stats files during execution
+########################################################################################################################
+
+import os
+import sys
+import time
+import json
+import random
+import socket
+import shutil
+import tempfile
+import threading
+import traceback
+import zlib
+import argparse
+import multiprocessing
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+import stats_io
+
+setup_error_status = 3 # Exit status of a worker that could not set up a problem
+
+class SetupError(Exception):
+    """Raised by a task solver that cannot set up the problem of a task, which is not an outcome of the task itself."""
+
+def lost_result(task):
+    """Return the result of a task that was given up after losing max_attempts leases."""
+    return {'stats': ["Worker_Lost", 0, float('nan'), float('nan')], 'run': None, 'setup': None, 'task': task,
+            'worker': None}
+
+def task_id(problem, scheme, instance):
+    return "%s__%s__%d" % (problem, scheme, instance)
+
+def make_tasks(stats, problems, schemes, n_runs):
+    """Create the tasks for all (problem, scheme, instance) which are missing in stats, in benchmark.py order."""
+    tasks = []
+    for problem in problems:
+        for i in range(n_runs):
+            for scheme in schemes[problem]:
+                if i >= len(stats[problem][scheme]):
+                    tasks.append({'id': task_id(problem, scheme, i), 'problem': problem, 'scheme': scheme,
+                                  'instance': i, 'n_runs': n_runs})
+    return tasks
+
+def _write_json(obj, file_name, tmp_dir):
+    """Atomically write obj as JSON to file_name, by writing to a temporary file in tmp_dir and renaming."""
+    (fd, tmp_name) = tempfile.mkstemp(dir=tmp_dir)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(obj, f)
+    os.rename(tmp_name, file_name)
+
+class DirectoryQueue(object):
+    """
+    Work queue backed by a shared directory, with one JSON file per task in the subdirectories pending, leased and
+    results.
+    """
+
+    def __init__(self, path, lease_timeout=lease_timeout, max_attempts=max_attempts):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._collected = set()
+        self._lost = set() # Collected results with the status Worker_Lost, which a late result may overwrite
+        for sub_dir in ['pending', 'leased', 'results', 'tmp']:
+            try:
+                os.makedirs(os.path.join(path, sub_dir))
+            except OSError:
+                if not os.path.isdir(os.path.join(path, sub_dir)):
+                    raise
+
+    def _file(self, sub_dir, name):
+        return os.path.join(self.path, sub_dir, name)
+
+    def _leased_file(self, task, worker_id):
+        return self._file('leased', '%s.json@%s' % (task['id'], worker_id))
+
+    def check_run(self, config, resume=False):
+        """Raise ValueError if the queue holds an earlier run, unless resume is set and its configuration is config."""
+        config = json.loads(json.dumps(config))
+        used = os.path.exists(self._file('', 'run.json')) or any(
+                len(os.listdir(self._file(sub_dir, ''))) > 0 for sub_dir in ['pending', 'leased', 'results'])
+        if used and not resume:
+            raise ValueError("Queue %s contains tasks or results of an earlier run. Use an empty queue directory, or "
+                             "--resume to continue that run." % self.path)
+        if used and os.path.exists(self._file('', 'run.json')):
+            with open(self._file('', 'run.json')) as f:
+                earlier_config = json.load(f)
+            if earlier_config != config:
+                raise ValueError("Queue %s was used for a run with a different configuration:\n%s" %
+                                 (self.path, earlier_config))
+
+    def publish(self, tasks, config=None, resume=False):
+        """Publish the tasks of a run with the configuration config, see check_run."""
+        self.check_run(config, resume)
+        _write_json(config, self._file('', 'run.json'), self._file('tmp', ''))
+        if os.path.exists(self._file('', 'done')):
+            os.remove(self._file('', 'done'))
+        leased = set(name.split('@')[0] for name in os.listdir(self._file('leased', '')))
+        for task in tasks:
+            name = task['id'] + '.json'
+            if not (os.path.exists(self._file('results', name)) or os.path.exists(self._file('pending', name)) or
+                    name in leased):
+                _write_json(task, self._file('pending', name), self._file('tmp', ''))
+
+    def lease(self, worker_id):
+        for name in sorted(os.listdir(self._file('pending', ''))):
+            task_file = self._file('pending', name)
+            leased_file = self._file('leased', '%s@%s' % (name, worker_id))
+            try:
+                os.rename(task_file, leased_file)
+            except OSError:
+                continue # Leased by another worker in the meantime
+            os.utime(leased_file, None)
+            with open(leased_file) as f:
+                return json.load(f)
+        return None
+
+    def heartbeat(self, task, worker_id):
+        try:
+            os.utime(self._leased_file(task, worker_id), None)
+        except OSError:
+            return False
+        return True
+
+    def release(self, task, worker_id):
+        """Hand a leased task back to pending without a result."""
+        try:
+            os.rename(self._leased_file(task, worker_id), self._file('pending', task['id'] + '.json'))
+        except OSError:
+            pass # Reaped in the meantime
+
+    def complete(self, task, worker_id, result):
+        result = dict(result, task=task, worker=worker_id)
+        _write_json(result, self._file('results', task['id'] + '.json'), self._file('tmp', ''))
+        try:
+            os.remove(self._leased_file(task, worker_id))
+        except OSError:
+            pass
+
+    def reap(self):
+        """Requeue or give up the leased tasks whose leases have expired, and return the numbers of each."""
+        (n_reaped, n_lost) = (0, 0)
+        now = time.time()
+        for name in os.listdir(self._file('leased', '')):
+            leased_file = self._file('leased', name)
+            reaped_file = self._file('tmp', name + '.reaped')
+            try:
+                if now - os.path.getmtime(leased_file) <= self.lease_timeout:
+                    continue
+                os.rename(leased_file, reaped_file)
+            except OSError:
+                continue # Completed or renewed in the meantime
+            with open(reaped_file) as f:
+                task = json.load(f)
+            task['attempts'] = task.get('attempts', 0) + 1
+            if task['attempts'] >= self.max_attempts:
+                _write_json(lost_result(task), self._file('results', task['id'] + '.json'), self._file('tmp', ''))
+                n_lost += 1
+            else:
+                _write_json(task, self._file('pending', task['id'] + '.json'), self._file('tmp', ''))
+                n_reaped += 1
+            os.remove(reaped_file)
+        return (n_reaped, n_lost)
+
+    def collect(self):
+        """Return the results that have arrived since the last call."""
+        results = []
+        for name in sorted(os.listdir(self._file('results', ''))):
+            if name not in self._collected or name in self._lost:
+                with open(self._file('results', name)) as f:
+                    result = json.load(f)
+                if name in self._lost and result['stats'][0] in stats_io.lost_statuses:
+                    continue
+                results.append(result)
+                self._collected.add(name)
+                if result['stats'][0] in stats_io.lost_statuses:
+                    self._lost.add(name)
+                else:
+                    self._lost.discard(name)
+        return results
+
+    def finish(self):
+        open(self._file('', 'done'), 'w').close()
+
+    def done(self):
+        return os.path.exists(self._file('', 'done'))
+
+class TaskBoard(object):
+    """In-memory work queue with the same interface as DirectoryQueue, served to the workers by serve_board."""
+
+    def __init__(self, lease_timeout=lease_timeout, max_attempts=max_attempts):
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._pending = []
+        self._leases = {} # task id: (task, worker id, deadline)
+        self._attempts = {} # task id: number of expired leases
+        self._results = []
+        self._completed = set()
+        self._lost = set() # Ids of the tasks given up as Worker_Lost, whose results may still arrive late
+        self._done = False
+
+    def publish(self, tasks, config=None, resume=False):
+        with self._lock:
+            self._done = False
+            queued = set(task['id'] for task in self._pending) | set(self._leases) | self._completed
+            self._pending.extend(task for task in tasks if task['id'] not in queued)
+
+    def lease(self, worker_id):
+        with self._lock:
+            if len(self._pending) == 0:
+                return None
+            task = self._pending.pop(0)
+            self._leases[task['id']] = (task, worker_id, time.time() + self.lease_timeout)
+            return task
+
+    def heartbeat(self, task, worker_id):
+        with self._lock:
+            lease = self._leases.get(task['id'])
+            if lease is None or lease[1] != worker_id:
+                return False
+            self._leases[task['id']] = (lease[0], worker_id, time.time() + self.lease_timeout)
+            return True
+
+    def release(self, task, worker_id):
+        with self._lock:
+            lease = self._leases.get(task['id'])
+            if lease is not None and lease[1] == worker_id:
+                self._pending.insert(0, self._leases.pop(task['id'])[0])
+
+    def complete(self, task, worker_id, result):
+        with self._lock:
+            lease = self._leases.get(task['id'])
+            if lease is not None and lease[1] == worker_id:
+                del self._leases[task['id']]
+            if task['id'] not in self._completed or task['id'] in self._lost:
+                self._completed.add(task['id'])
+                self._lost.discard(task['id'])
+                self._results.append(dict(result, task=task, worker=worker_id))
+
+    def reap(self):
+        with self._lock:
+            now = time.time()
+            expired = [tid for (tid, (task, worker_id, deadline)) in self._leases.items() if deadline < now]
+            n_lost = 0
+            for tid in expired:
+                task = self._leases.pop(tid)[0]
+                self._attempts[tid] = self._attempts.get(tid, 0) + 1
+                if self._attempts[tid] >= self.max_attempts:
+                    self._completed.add(tid)
+                    self._lost.add(tid)
+                    self._results.append(lost_result(task))
+                    n_lost += 1
+                else:
+                    self._pending.insert(0, task)
+            return (len(expired) - n_lost, n_lost)
+
+    def collect(self):
+        with self._lock:
+            (results, self._results) = (self._results, [])
+            return results
+
+    def finish(self):
+        self._done = True
+
+    def done(self):
+        return self._done
+
+class _BoardRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode('utf-8'))
+        board = self.server.board
+        if request['op'] == 'lease':
+            reply = {'task': board.lease(request['worker']), 'done': board.done()}
+        elif request['op'] == 'heartbeat':
+            reply = {'ok': board.heartbeat(request['task'], request['worker'])}
+        elif request['op'] == 'release':
+            board.release(request['task'], request['worker'])
+            reply = {'ok': True}
+        elif request['op'] == 'complete':
+            board.complete(request['task'], request['worker'], request['result'])
+            reply = {'ok': True}
+        else:
+            reply = {'error': 'Unknown operation %s.' % request['op']}
+        self.wfile.write((json.dumps(reply) + '\n').encode('utf-8'))
+
+class _BoardServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def serve_board(board, host, port):
+    """Serve board over TCP in a background thread and return the server."""
+    server = _BoardServer((host, port), _BoardRequestHandler)
+    server.board = board
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+class SocketQueue(object):
+    """Worker side of a TaskBoard served over TCP."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._done = False
+
+    def _request(self, request):
+        connection = socket.create_connection((self.host, self.port), timeout=60)
+        try:
+            connection.sendall((json.dumps(request) + '\n').encode('utf-8'))
+            reply = connection.makefile('rb').readline()
+        finally:
+            connection.close()
+        return json.loads(reply.decode('utf-8'))
+
+    def lease(self, worker_id):
+        reply = self._request({'op': 'lease', 'worker': worker_id})
+        self._done = reply['done']
+        return reply['task']
+
+    def heartbeat(self, task, worker_id):
+        return self._request({'op': 'heartbeat', 'task': task, 'worker': worker_id})['ok']
+
+    def release(self, task, worker_id):
+        self._request({'op': 'release', 'task': task, 'worker': worker_id})
+
+    def complete(self, task, worker_id, result):
+        self._request({'op': 'complete', 'task': task, 'worker': worker_id, 'result': result})
+
+    def done(self):
+        return self._done
+
+def parse_tcp_address(queue_spec):
+    """Return (host, port) if queue_spec has the form tcp://host:port and None otherwise."""
+    if not queue_spec.startswith('tcp://'):
+        return None
+    (host, port) = queue_spec[len('tcp://'):].rsplit(':', 1)
+    return (host, int(port))
+
+class _Heartbeat(threading.Thread):
+    """Renews the lease of a task at regular intervals until stopped."""
+
+    def __init__(self, queue, task, worker_id, interval):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.queue = queue
+        self.task = task
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lost = False
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                renewed = self.queue.heartbeat(self.task, self.worker_id)
+            except (socket.error, ValueError):
+                continue # The lease will be renewed by the next heartbeat, unless it expires first
+            if not renewed:
+                self.lost = True
+                print('Lost lease on task %s, it may be solved twice.' % self.task['id'])
+                return
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+class BenchmarkTaskSolver(object):
+    """Solves tasks with the problems and instances of benchmark.py, setting up each problem on first use."""
+
+    def __init__(self):
+        import benchmark
+        self.benchmark = benchmark
+        self.instances = {}
+
+    @property
+    def backend(self):
+        return self.benchmark.backend
+
+    def __call__(self, task):
+        problem = task['problem']
+        try:
+            if problem not in self.benchmark.solvers:
+                self.benchmark.setup_problem(problem)
+            if len(self.instances.get(problem, [])) <= task['instance']:
+                self.instances[problem] = self.benchmark.generate_instances(problem, task['n_runs'])
+        except Exception as e:
+            traceback.print_exc()
+            raise SetupError('Unable to set up %s: %s' % (problem, e))
+        (stats, run) = self.benchmark.measure(problem, task['scheme'], self.instances[problem][task['instance']])
+        return (stats, run, self.benchmark.setup_info[problem][task['scheme']])
+
+    def initial_state(self, task):
+        """
+        Return the applied initial state of the instance of task and the nominal initial state of its problem (see
+        benchmark.applied_state), or Nones if the instance has not been generated.
+        """
+        instances = self.instances.get(task['problem'], [])
+        if task['instance'] >= len(instances):
+            return (None, None)
+        nominal = self.benchmark.nominal_x0.get(task['problem'])
+        if nominal is not None:
+            nominal = self.benchmark.applied_state(task['problem'], nominal)
+        return (self.benchmark.applied_state(task['problem'], instances[task['instance']]), nominal)
+
+    def profile(self, task):
+        """Return and forget the stack samples of the solves of task, or None if the solves are not profiled."""
+        return self.benchmark.profiles.pop((task['problem'], task['scheme']), None)
+
+class FakeTaskSolver(object):
+    """
+    Stand-in for BenchmarkTaskSolver which sleeps for a random time, and kills the worker with probability crash_rate.
+    """
+
+    backend = "fake"
+
+    def __init__(self, max_time=1., fail_rate=0.1, crash_rate=0.):
+        self.max_time = max_time
+        self.fail_rate = fail_rate
+        self.crash_rate = crash_rate
+
+    def __call__(self, task):
+        rng = random.Random(zlib.crc32(task['id'].encode('utf-8')))
+        solve_time = rng.uniform(0., self.max_time)
+        time.sleep(solve_time)
+        if random.random() < self.crash_rate:
+            os._exit(1)
+        if rng.random() < self.fail_rate:
+            return (("Maximum_CpuTime_Exceeded", rng.randint(10, 1000), rng.uniform(0., 10.), solve_time), None, None)
+        return (("Solve_Succeeded", rng.randint(10, 200), rng.uniform(0., 10.), solve_time), None, None)
+
+def work(queue, worker_id, solve_task, heartbeat_interval=heartbeat_interval, poll_interval=poll_interval,
+         max_idle_errors=10):
+    """
+    Lease and solve tasks until the coordinator has finished, and return True, or False if a problem could not be set
+    up.
+    """
+    n_errors = 0
+    while True:
+        try:
+            task = queue.lease(worker_id)
+        except (socket.error, ValueError):
+            # The coordinator is unreachable, which also happens after it has finished and exited
+            n_errors += 1
+            if n_errors >= max_idle_errors:
+                return True
+            time.sleep(poll_interval)
+            continue
+        n_errors = 0
+        if task is None:
+            if queue.done():
+                return True
+            time.sleep(poll_interval)
+            continue
+        print('%s: %s, scheme %s: %d/%d' % (worker_id, task['problem'], task['scheme'], task['instance']+1,
+                                            task['n_runs']))
+        heartbeat = _Heartbeat(queue, task, worker_id, heartbeat_interval)
+        heartbeat.start()
+        setup_error = None
+        try:
+            (stats, run, setup) = solve_task(task)
+        except SetupError as e:
+            setup_error = e
+        except Exception:
+            traceback.print_exc()
+            (stats, run, setup) = (("Worker_Error", 0, float('nan'), float('nan')), None, None)
+        finally:
+            heartbeat.stop()
+        if setup_error is not None:
+            try:
+                queue.release(task, worker_id)
+            except (socket.error, OSError, ValueError):
+                pass # The lease expires instead
+            print('%s: %s Released task %s, exiting.' % (worker_id, setup_error, task['id']))
+            return False
+        result = {'stats': list(stats), 'run': run, 'setup': setup, 'backend': getattr(solve_task, 'backend', None)}
+        if hasattr(solve_task, 'initial_state'):
+            (result['x0'], result['nominal']) = solve_task.initial_state(task)
+        if hasattr(solve_task, 'profile'):
+            result['profile'] = solve_task.profile(task)
+        try:
+            queue.complete(task, worker_id, result)
+        except (socket.error, OSError, ValueError):
+            # The coordinator has finished and exited, after the task was reassigned or given up
+            print('%s: Unable to deliver the result of task %s, dropping it and exiting.' % (worker_id, task['id']))
+            return True
+
+def run_config(benchmark, problems, n_runs):
+    """Return the configuration of a run, which determines its tasks and instances."""
+    return {'problems': sorted(problems), 'n_runs': n_runs,
+            'schemes': dict((problem, benchmark.schemes[problem]) for problem in problems),
+            'std_dev': dict((problem, benchmark.std_dev[problem]) for problem in problems)}
+
+def coordinate(queue, problems, n_runs, old_stats_file=None, stats_dir="stats", poll_interval=poll_interval,
+               save_interval=save_interval, abort=None, resume=False):
+    """Publish the missing tasks of problems, collect their results and save stats files. Return the file names."""
+    import benchmark
+    (stats, extras) = benchmark.load_stats(problems, old_stats_file)
+    tasks = make_tasks(stats, problems, benchmark.schemes, n_runs)
+    queue.publish(tasks, run_config(benchmark, problems, n_runs), resume)
+    remaining = set(task['id'] for task in tasks)
+    print('Published %d tasks.' % len(remaining))
+    results = dict(((problem, scheme), {}) for problem in problems for scheme in stats[problem])
+    states = {} # problem: {instance: initial state}
+    lost = set() # Ids of the tasks recorded as Worker_Lost, whose results may still arrive late
+    last_save = time.time()
+    while len(remaining) > 0 and not (abort is not None and abort.is_set()):
+        (n_reaped, n_lost) = queue.reap()
+        if n_reaped > 0:
+            print('Reassigning %d tasks with expired leases.' % n_reaped)
+        if n_lost > 0:
+            print('Giving up %d tasks after %d expired leases, recorded as Worker_Lost.' % (n_lost, queue.max_attempts))
+        for result in queue.collect():
+            task = result['task']
+            if task['id'] in remaining:
+                remaining.remove(task['id'])
+            elif task['id'] in lost and result['stats'][0] not in stats_io.lost_statuses:
+                print('Late result of task %s replaces Worker_Lost.' % task['id'])
+                lost.remove(task['id'])
+            else:
+                continue
+            if result['stats'][0] in stats_io.lost_statuses:
+                lost.add(task['id'])
+            _record_result(stats, extras, results, task, result)
+            if result.get('backend') is not None:
+                stats_io.add_backend(extras, result['backend'])
+            if result.get('setup') is not None:
+                extras['setup'].setdefault(task['problem'], {})[task['scheme']] = result['setup']
+            if result.get('x0') is not None:
+                states.setdefault(task['problem'], {})[task['instance']] = result['x0']
+            if result.get('nominal') is not None:
+                extras['nominal'][task['problem']] = result['nominal']
+            if result.get('profile') is not None:
+                stacks = benchmark.profiles.setdefault((task['problem'], task['scheme']), {})
+                for (stack, weight) in result['profile'].items():
+                    stacks[stack] = stacks.get(stack, 0.) + weight
+        if len(remaining) > 0 and time.time() - last_save > save_interval:
+            _merge_results(stats, extras, results, states)
+            for problem in problems:
+                benchmark.save_stats(stats, extras, problem, stats_dir)
+            last_save = time.time()
+        time.sleep(poll_interval)
+    queue.finish()
+    if len(remaining) > 0:
+        print('Aborted with %d of %d tasks remaining.' % (len(remaining), len(tasks)))
+        if len(remaining) == len(tasks):
+            return []
+    _merge_results(stats, extras, results, states)
+    file_names = [benchmark.save_stats(stats, extras, problem, stats_dir) for problem in problems]
+    for file_name in file_names:
+        print(file_name)
+    for problem in problems:
+        if any(key[0] == problem for key in benchmark.profiles):
+            benchmark.write_profiles(problem, extras, stats_dir)
+    return file_names
+
+def _record_result(stats, extras, results, task, result):
+    """Add the result of task to results, or replace its run in stats if it has already been merged."""
+    (problem, scheme, i) = (task['problem'], task['scheme'], task['instance'])
+    if i < len(stats[problem][scheme]):
+        stats[problem][scheme][i] = tuple(result['stats'])
+        extras['runs'][problem][scheme][i] = result.get('run')
+    else:
+        results[(problem, scheme)][i] = (tuple(result['stats']), result.get('run'))
+
+def _merge_results(stats, extras, results, states):
+    """Append the collected results and initial states which directly follow the instances already in stats."""
+    for ((problem, scheme), scheme_results) in results.items():
+        scheme_stats = stats[problem][scheme]
+        while len(scheme_stats) in scheme_results:
+            (run_stats, run) = scheme_results.pop(len(scheme_stats))
+            scheme_stats.append(run_stats)
+            extras['runs'][problem][scheme].append(run)
+    for (problem, problem_states) in states.items():
+        instances = extras['instances'].setdefault(problem, [])
+        while len(instances) in problem_states:
+            instances.append(problem_states.pop(len(instances)))
+
+def make_queue(queue_spec, coordinator, lease_timeout=lease_timeout, max_attempts=max_attempts):
+    """Create the queue given by queue_spec, serving it over TCP if coordinator is True."""
+    address = parse_tcp_address(queue_spec)
+    if address is None:
+        return DirectoryQueue(queue_spec, lease_timeout, max_attempts)
+    if coordinator:
+        board = TaskBoard(lease_timeout, max_attempts)
+        board.server = serve_board(board, *address)
+        return board
+    return SocketQueue(*address)
+
+def run_worker(queue_spec, worker_id, fake_solver=False, fake_crash_rate=0., heartbeat_interval=heartbeat_interval,
+               pin_cpu=None, replay=False, profile=False):
+    import benchmark
+    if pin_cpu is not None:
+        benchmark.pin_to_core(pin_cpu)
+    if replay:
+        benchmark.backend = "replay"
+    if profile:
+        benchmark.profile_solves = True
+    if fake_solver:
+        solve_task = FakeTaskSolver(crash_rate=fake_crash_rate)
+    else:
+        solve_task = BenchmarkTaskSolver()
+    return work(make_queue(queue_spec, False), worker_id, solve_task, heartbeat_interval)
+
+def _run_local_worker(*args):
+    if not run_worker(*args):
+        sys.exit(setup_error_status)
+
+def run_local(args):
+    """
+    Run a coordinator and args.workers local workers, restarting crashed workers, and return whether all tasks were
+    completed.
+    """
+    queue_spec = args.queue
+    if queue_spec is None:
+        queue_spec = tempfile.mkdtemp(prefix='benchmark_queue_')
+    queue = make_queue(queue_spec, True, args.lease_timeout, args.max_attempts)
+    if hasattr(queue, 'check_run'):
+        import benchmark
+        queue.check_run(run_config(benchmark, args.problems, args.n_runs), args.resume)
+
+    def start_worker(k):
+        process = multiprocessing.Process(
+                target=_run_local_worker,
+                args=(queue_spec, '%s-local%d-%d' % (socket.gethostname(), k, int(time.time()*1000)),
+                      args.fake_solver, args.fake_crash_rate, args.heartbeat_interval, None, args.replay,
+                      args.profile))
+        process.start()
+        return process
+    workers = [start_worker(k) for k in range(args.workers)]
+    stopped = threading.Event()
+    aborted = threading.Event()
+
+    def supervise():
+        failed = set()
+        while not stopped.wait(poll_interval):
+            for k in range(len(workers)):
+                if k in failed:
+                    continue
+                if workers[k].exitcode == setup_error_status:
+                    print('Local worker %d failed to set up a problem, not restarting it.' % k)
+                    failed.add(k)
+                elif workers[k].exitcode not in [None, 0]:
+                    print('Local worker %d died, restarting it.' % k)
+                    workers[k] = start_worker(k)
+            if len(failed) == len(workers):
+                print('All local workers failed to set up a problem.')
+                aborted.set()
+                return
+    supervisor = threading.Thread(target=supervise)
+    supervisor.daemon = True
+    supervisor.start()
+    try:
+        coordinate(queue, args.problems, args.n_runs, args.old_stats_file, args.stats_dir, abort=aborted,
+                   resume=args.resume)
+    finally:
+        stopped.set()
+        supervisor.join()
+        for process in workers:
+            process.join()
+        if args.queue is None:
+            shutil.rmtree(queue_spec)
+    return not aborted.is_set()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed execution of benchmark.py.")
+    subparsers = parser.add_subparsers(dest='command')
+    coordinator_parser = subparsers.add_parser('coordinator', help="publish tasks and collect results")
+    worker_parser = subparsers.add_parser('worker', help="solve tasks")
+    local_parser = subparsers.add_parser('local', help="run a coordinator and local workers")
+    for sub_parser in [coordinator_parser, local_parser]:
+        sub_parser.add_argument('--problems', nargs='+', default=None,
+                                help="problems to benchmark (default: benchmark.problems)")
+        sub_parser.add_argument('--n-runs', type=int, default=None,
+                                help="number of instances per problem (default: benchmark.n_runs)")
+        sub_parser.add_argument('--old-stats-file', default=None, help="stats file to continue appending results to")
+        sub_parser.add_argument('--stats-dir', default="stats", help="directory to save stats files in")
+        sub_parser.add_argument('--lease-timeout', type=float, default=lease_timeout)
+        sub_parser.add_argument('--max-attempts', type=int, default=max_attempts,
+                                help="expired leases after which a task is given up as Worker_Lost")
+        sub_parser.add_argument('--resume', action='store_true',
+                                help="continue an earlier run in the same queue directory, reusing its results")
+    for sub_parser in [worker_parser, local_parser]:
+        sub_parser.add_argument('--fake-solver', action='store_true', help="sleep instead of solving")
+        sub_parser.add_argument('--fake-crash-rate', type=float, default=0.,
+                                help="probability that a fake solve kills its worker")
+        sub_parser.add_argument('--replay', action='store_true',
+                                help="replay recorded solver statistics instead of solving, see replay.py")
+        sub_parser.add_argument('--heartbeat-interval', type=float, default=heartbeat_interval)
+        sub_parser.add_argument('--profile', action='store_true',
+                                help="profile the solves, the coordinator writes the profiles (see profiler.py)")
+    coordinator_parser.add_argument('--queue', required=True, help="shared directory or tcp://host:port")
+    worker_parser.add_argument('--queue', required=True, help="shared directory or tcp://host:port")
+    worker_parser.add_argument('--worker-id', default='%s-%d' % (socket.gethostname(), os.getpid()))
+    worker_parser.add_argument('--pin-cpu', type=int, default=None, help="core to pin the worker to")
+    local_parser.add_argument('--queue', default=None,
+                              help="shared directory or tcp://host:port (default: temporary directory)")
+    local_parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args(argv)
+
+    if args.command in ['coordinator', 'local']:
+        import benchmark
+        if args.problems is None:
+            args.problems = benchmark.problems
+        if args.n_runs is None:
+            args.n_runs = benchmark.n_runs
+    if args.command == 'coordinator':
+        queue = make_queue(args.queue, True, args.lease_timeout, args.max_attempts)
+        coordinate(queue, args.problems, args.n_runs, args.old_stats_file, args.stats_dir, resume=args.resume)
+        if isinstance(queue, TaskBoard):
+            time.sleep(5*poll_interval) # Give the workers a chance to see that the coordinator has finished
+    elif args.command == 'worker':
+        if not run_worker(args.queue, args.worker_id, args.fake_solver, args.fake_crash_rate, args.heartbeat_interval,
+                          args.pin_cpu, args.replay, args.profile):
+            sys.exit(setup_error_status)
+    elif args.command == 'local':
+        if not run_local(args):
+            sys.exit(1)
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
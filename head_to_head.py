@@ -0,0 +1,132 @@
+"""
+Pairwise head-to-head comparison of the schemes on the same instances, for stats files generated with benchmark.py.
+
+For every pair of schemes, the wins, losses and ties (within tie_tolerance) on the instances that at least one of them
+solved, the geometric mean time ratio with its confidence interval and the p-value of the paired Wilcoxon signed-rank
+test on the instances that both solved are computed. All pairs are computed at once on arrays of shape (n_schemes,
+n_schemes, n_instances).
+"""
+
+######################################################## Setup #########################################################
+# dict with problem: stats_file
+stats_files = {'car': 'stats/stats_car_10',
+               'ccpp': 'stats/stats_ccpp_30',
+               'double_pendulum': 'stats/stats_double_pendulum_30',
+               'fourbar1': 'stats/stats_fourbar1_3',
+               'dist': 'stats/stats_dist_30'}
+time_estimate = "time" # Solution time to use: "time" (first solve), or "min" or "median" of repeated solves
+tie_tolerance = 0.05 # Relative time difference below which two successful solves are a tie
+confidence = 0.95 # Confidence level of the geometric mean time ratio intervals
+########################################################################################################################
+
+import numpy as np
+from scipy import stats as sp_stats
+
+def time_matrix(statses, schemes):
+    """
+    Return (times, success) of schemes on all instances of statses, of shape (n_schemes, n_instances), with NaN times
+    for failed solves.
+    """
+    times = []
+    success = []
+    for problem in sorted(statses):
+        stats = statses[problem]
+        n_runs = min(len(stats[scheme]) for scheme in schemes)
+        times.append(np.array([[run[3] for run in stats[scheme][:n_runs]] for scheme in schemes], dtype=float))
+        success.append(np.array([[run[0] == "Solve_Succeeded" for run in stats[scheme][:n_runs]]
+                                 for scheme in schemes], dtype=bool))
+    times = np.hstack(times)
+    success = np.hstack(success) & (times > 0)
+    return (np.where(success, times, np.nan), success)
+
+def _tie_groups(sorted_values):
+    """
+    Return the first and last index of the group of equal values of each element of sorted_values, which is sorted
+    along the last axis.
+    """
+    n = sorted_values.shape[-1]
+    index = np.arange(n) * np.ones(sorted_values.shape, dtype=int)
+    changes = sorted_values[..., 1:] != sorted_values[..., :-1]
+    starts = np.concatenate([np.ones(changes.shape[:-1] + (1,), dtype=bool), changes], axis=-1)
+    ends = np.concatenate([changes, np.ones(changes.shape[:-1] + (1,), dtype=bool)], axis=-1)
+    first = np.maximum.accumulate(np.where(starts, index, 0), axis=-1)
+    last = np.minimum.accumulate(np.where(ends, index, n - 1)[..., ::-1], axis=-1)[..., ::-1]
+    return (first, last)
+
+def wilcoxon_matrix(log_ratios, common):
+    """
+    Return the two-sided p-values of the Wilcoxon signed-rank test (normal approximation with tie and continuity
+    corrections) of log_ratios over the instances in common for all pairs, or NaN without nonzero differences.
+    """
+    nonzero = common & (log_ratios != 0)
+    abs_diffs = np.where(nonzero, np.abs(log_ratios), np.inf) # Excluded entries are ranked last
+    # Rank in sorted order, where the ranks and tie sizes follow from the groups of equal values
+    order = np.argsort(abs_diffs, axis=-1)
+    (first, last) = _tie_groups(np.take_along_axis(abs_diffs, order, axis=-1))
+    ranks = (first + last)/2. + 1
+    tie_sizes = last - first + 1
+    positive = np.take_along_axis(log_ratios > 0, order, axis=-1)
+    nonzero = np.take_along_axis(nonzero, order, axis=-1)
+    n = nonzero.sum(axis=-1).astype(float)
+    w_plus = np.where(nonzero & positive, ranks, 0.).sum(axis=-1)
+    tie_correction = np.where(nonzero, tie_sizes**2 - 1, 0.).sum(axis=-1) / 48.
+    variance = n*(n + 1)*(2*n + 1)/24. - tie_correction
+    deviation = w_plus - n*(n + 1)/4.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.maximum(np.abs(deviation) - 0.5, 0.) / np.sqrt(variance)
+        p_values = np.where(variance > 0, 2*sp_stats.norm.sf(z), np.nan)
+    return p_values
+
+def head_to_head(times, success, tie_tolerance=0.05, confidence=0.95):
+    """
+    Compare all pairs of schemes and return a dict of matrices wins, losses, ties, n_common, ratio, ratio_low,
+    ratio_high and p_value, where entry [i, j] compares scheme i with scheme j.
+    """
+    log_times = np.log(np.where(success, times, 1.))
+    common = success[:, None, :] & success[None, :, :]
+    log_ratios = np.where(common, log_times[:, None, :] - log_times[None, :, :], 0.)
+    tie = common & (np.abs(log_ratios) <= np.log1p(tie_tolerance))
+    wins = ((common & (log_ratios < 0) & ~tie) | (success[:, None, :] & ~success[None, :, :])).sum(axis=-1)
+    n_common = common.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = log_ratios.sum(axis=-1) / n_common
+        variance = (np.where(common, log_ratios - mean[:, :, None], 0.)**2).sum(axis=-1) / (n_common - 1)
+        half_width = sp_stats.t.ppf(0.5 + confidence/2., n_common - 1) * np.sqrt(variance / n_common)
+    return {'wins': wins,
+            'losses': wins.T,
+            'ties': tie.sum(axis=-1),
+            'n_common': n_common,
+            'ratio': np.exp(mean),
+            'ratio_low': np.exp(mean - half_width),
+            'ratio_high': np.exp(mean + half_width),
+            'p_value': wilcoxon_matrix(log_ratios, common)}
+
+def print_matrix(title, matrix, schemes, fmt='%8.2f'):
+    width = len(fmt % 0)
+    print("\n" + title)
+    print('%-6s' % "" + "".join(('%' + str(width) + 's') % scheme for scheme in schemes))
+    for (i, scheme) in enumerate(schemes):
+        print('%-6s' % scheme + "".join(fmt % value if i != j else width*' ' for (j, value) in enumerate(matrix[i])))
+
+def print_pairs(results, schemes, pairs):
+    """Print the head-to-head statistics of the given pairs of schemes."""
+    print('%-14s %6s %6s %6s %7s %22s %9s' % ("Pair", "Wins", "Losses", "Ties", "Common", "Time ratio (CI)", "p"))
+    for (a, b) in pairs:
+        (i, j) = (schemes.index(a), schemes.index(b))
+        print('%-14s %6d %6d %6d %7d %8.3f [%5.3f, %5.3f] %9.2e' %
+              ('%s vs %s' % (a, b), results['wins'][i, j], results['losses'][i, j], results['ties'][i, j],
+               results['n_common'][i, j], results['ratio'][i, j], results['ratio_low'][i, j],
+               results['ratio_high'][i, j], results['p_value'][i, j]))
+
+if __name__ == "__main__":
+    import performance_profile as pp
+    statses = pp.add_scheme_equalities(pp.load_statses(stats_files, time_estimate))
+    schemes = [pp.schemes[i] for i in pp.scheme_idxs]
+    (times, success) = time_matrix(statses, schemes)
+    results = head_to_head(times, success, tie_tolerance, confidence)
+    print('%d instances, %d schemes' % (times.shape[1], len(schemes)))
+    print_matrix("Wins of row over column", results['wins'], schemes, '%7d')
+    print_matrix("Geometric mean time ratio of row over column", results['ratio'], schemes, '%7.2f')
+    print_matrix("Wilcoxon signed-rank p-value", results['p_value'], schemes, '%9.1e')
+    print("\nNeighbouring schemes:")
+    print_pairs(results, schemes, list(zip(schemes[:-1], schemes[1:])))
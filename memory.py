@@ -0,0 +1,86 @@
+"""
+Measurement of the peak memory usage of the benchmark process during a block of code.
+
+On Linux, the peak RSS is reset on entry and read on exit. Elsewhere, it is sampled by a background thread, which only
+runs when the solver releases the GIL, so the sampled peak is a lower bound.
+"""
+
+import os
+import threading
+
+def current_rss():
+    """Return the resident set size of the current process in bytes, or None if it cannot be determined."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+def reset_peak_rss():
+    """Reset the peak RSS of the current process to its current RSS and return whether it succeeded (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+def peak_rss():
+    """Return the peak RSS of the current process in bytes, or None if it cannot be determined."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+class PeakMemory(object):
+    """
+    Context manager measuring the peak RSS in bytes (peak) and its increase over the RSS on entry (increase), or None.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = None
+        self.peak = None
+        self.increase = None
+        self._use_hwm = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.start = current_rss()
+        self.peak = self.start
+        self._use_hwm = reset_peak_rss() and peak_rss() is not None
+        if not self._use_hwm and self.start is not None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self._use_hwm:
+            self.peak = peak_rss()
+        elif self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._sample()
+        if self.peak is not None and self.start is not None:
+            self.increase = self.peak - self.start
+        return False
@@ -0,0 +1,65 @@
+"""
+Extraction of the size and structure of the collocation NLP from a prepared JModelica.org optimization solver.
+
+Metrics that cannot be obtained (for example with other JModelica.org or CasADi revisions) are None.
+"""
+
+def _nlp_solver(solver):
+    return solver.collocator.solver_object
+
+def _nnz(matrix):
+    try:
+        return int(matrix.nnz())
+    except AttributeError:
+        return int(matrix.size()) # Older CasADi revisions
+
+def nlp_dimensions(solver):
+    """Return a dict with the number of NLP variables (n_var) and constraints (n_con) of a prepared solver."""
+    dims = {'n_var': None, 'n_con': None}
+    try:
+        nlp = _nlp_solver(solver)
+        dims['n_var'] = int(nlp.input('x0').numel())
+        dims['n_con'] = int(nlp.input('lbg').numel())
+    except Exception:
+        pass
+    return dims
+
+def nlp_sparsity(solver):
+    """
+    Return a dict with the number of nonzeros of the constraint Jacobian (nnz_jac) and of the Hessian of the
+    Lagrangian (nnz_hess) of a prepared solver.
+    """
+    sparsity = {'nnz_jac': None, 'nnz_hess': None}
+    try:
+        nlp = _nlp_solver(solver)
+        sparsity['nnz_jac'] = _nnz(nlp.jacG().output(0))
+        sparsity['nnz_hess'] = _nnz(nlp.hessLag().output(0))
+    except Exception:
+        pass
+    return sparsity
+
+def blt_blocks(op):
+    """
+    Return a dict with n_blocks, max_block (size of the largest block), n_torn_blocks and max_torn_block (largest number
+    of tearing variables in a block), all None without symbolic elimination.
+    """
+    blocks = {'n_blocks': None, 'max_block': None, 'n_torn_blocks': None, 'max_torn_block': None}
+    try:
+        components = op._graph.components
+    except AttributeError:
+        return blocks
+    block_sizes = [len(component.vars) for component in components]
+    torn_sizes = [len(getattr(component, 'tear_vars', [])) for component in components]
+    torn_sizes = [size for size in torn_sizes if size > 0]
+    blocks['n_blocks'] = len(block_sizes)
+    blocks['max_block'] = max(block_sizes) if block_sizes else 0
+    blocks['n_torn_blocks'] = len(torn_sizes)
+    blocks['max_torn_block'] = max(torn_sizes) if torn_sizes else 0
+    return blocks
+
+def nlp_structure(solver, op):
+    """Return a dict with all the metrics of nlp_dimensions, nlp_sparsity and blt_blocks."""
+    structure = nlp_dimensions(solver)
+    structure.update(nlp_sparsity(solver))
+    structure.update(blt_blocks(op))
+    return structure
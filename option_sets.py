@@ -0,0 +1,122 @@
+"""
+Solver option sets as a benchmark dimension.
+
+The designs of IPOPT option combinations that benchmark.py runs when option_factors is set are generated by
+full_factorial and fractional_factorial, and each option set is stored in the extras of its stats files.
+
+Running this script plots one performance profile per option set, and prints the geometric mean performance ratio of
+every (scheme, option set) combination relative to the best combination on each instance, with failures counted as the
+largest ratio of the profiles.
+"""
+
+######################################################## Setup #########################################################
+# dict with problem: list of stats files, one per option set
+stats_files = {'dist': ['stats/stats_dist_30_opt0_0000000000', 'stats/stats_dist_30_opt1_0000000000']}
+n_tau = 100 # Number of sample points for tau
+time_estimate = "time" # Solution time to use: "time" (first solve), or "min" or "median" of repeated solves
+########################################################################################################################
+
+import itertools
+import numpy as np
+import stats_io
+
+def full_factorial(factors):
+    """
+    Return all combinations of the levels of factors, which is a list of (option, levels) pairs, as a list of dicts.
+    """
+    names = [name for (name, levels) in factors]
+    return [dict(zip(names, combination)) for combination in itertools.product(*[levels for (name, levels) in factors])]
+
+def fractional_factorial(factors, generators=None):
+    """
+    Return the two-level fractional factorial design 2^(k-p) of factors, where each generator lists the base factors
+    whose product gives the level of one of the p generated factors. The default is the highest-resolution half
+    fraction.
+    """
+    for (name, levels) in factors:
+        if len(levels) != 2:
+            raise ValueError("Fractional factorial designs require two levels per factor, but %s has %d." %
+                             (name, len(levels)))
+    if generators is None:
+        generators = [list(range(len(factors) - 1))]
+    n_base = len(factors) - len(generators)
+    if n_base < 1:
+        raise ValueError("A fractional factorial design requires fewer generators than factors.")
+    design = []
+    for base_signs in itertools.product([-1, 1], repeat=n_base):
+        signs = list(base_signs) + [int(np.prod([base_signs[j] for j in generator])) for generator in generators]
+        design.append(dict((name, levels[(sign + 1) // 2]) for ((name, levels), sign) in zip(factors, signs)))
+    return design
+
+def option_set_name(options):
+    if len(options) == 0:
+        return "default"
+    return ", ".join('%s=%s' % (name, options[name]) for name in sorted(options))
+
+def load_option_sets(stats_files, time_estimate="time"):
+    """
+    Load the stats files and return {option set name: {problem: {scheme: list}}}, with the scheme equalities added.
+    """
+    import performance_profile
+    option_sets = {}
+    for problem in stats_files:
+        for file_name in stats_files[problem]:
+            stats = stats_io.read_stats(file_name)
+            prb_key = list(stats.keys())[0]
+            extras = stats_io.read_extras(file_name)
+            name = option_set_name(extras['options'])
+            prb_stats = stats_io.robust_stats(stats[prb_key], extras['runs'].get(prb_key, {}), time_estimate)
+            prb_stats = stats_io.drop_lost(prb_stats)
+            option_sets.setdefault(name, {})[problem] = prb_stats
+    for name in option_sets:
+        performance_profile.add_scheme_equalities(option_sets[name])
+    return option_sets
+
+def combination_table(option_sets, schemes, max_ratio=100.):
+    """Return {(scheme, option set name): geometric mean of the performance ratios} on the common instances."""
+    import performance_profile
+    joint = {}
+    for name in option_sets:
+        for problem in option_sets[name]:
+            for scheme in schemes:
+                joint.setdefault(problem, {})[(scheme, name)] = option_sets[name][problem][scheme]
+    problems = list(joint.keys())
+    for problem in problems:
+        if len(joint[problem]) < len(schemes)*len(option_sets):
+            del joint[problem] # Not run with every option set
+    combinations = [(scheme, name) for name in option_sets for scheme in schemes]
+    (r, n_p) = performance_profile.performance_ratios(joint, combinations)
+    return dict((combination, np.exp(np.mean(np.log(np.minimum(r[combination], max_ratio)))))
+                for combination in combinations)
+
+def print_combination_table(table, schemes, names):
+    best = min(table, key=table.get)
+    print('%-8s' % "Scheme" + "".join(' %12s' % ("set%d" % k) for k in range(len(names))))
+    best_schemes = dict((name, min(schemes, key=lambda scheme: table[(scheme, name)])) for name in names)
+    for scheme in schemes:
+        row = '%-8s' % scheme
+        for name in names:
+            mark = "*" if best_schemes[name] == scheme else " "
+            mark = "**" if (scheme, name) == best else mark
+            row += ' %10.2f%-2s' % (table[(scheme, name)], mark)
+        print(row)
+    print("\n* best scheme for the option set, ** best combination")
+    for (k, name) in enumerate(names):
+        print("set%d: %s" % (k, name))
+    print("\nBest combination: scheme %s with %s" % best)
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    import performance_profile as pp
+    option_sets = load_option_sets(stats_files, time_estimate)
+    names = sorted(option_sets)
+    schemes = [pp.schemes[i] for i in pp.scheme_idxs]
+    scheme_labels = [pp.scheme_labels[i] for i in pp.scheme_idxs]
+    scheme_colors = pp.get_scheme_colors()
+    scheme_colors = [scheme_colors[i] for i in pp.scheme_idxs]
+    scheme_styles = [pp.scheme_styles[i] for i in pp.scheme_idxs]
+    for (k, name) in enumerate(names):
+        (r, n_p) = pp.performance_ratios(option_sets[name], schemes)
+        pp.plot_profile(r, n_p, schemes, scheme_labels, scheme_colors, scheme_styles, n_tau, figure=k+1, title=name)
+    print_combination_table(combination_table(option_sets, schemes), schemes, names)
+    plt.show()
@@ -17,12 +17,13 @@ stats_files = {'car': 'stats/stats_car_10',
                'fourbar1': 'stats/stats_fourbar1_3', 
                'dist': 'stats/stats_dist_30'} 
 n_tau = 100 # Number of sample points for tau
+time_estimate = "time" # Solution time to use: "time" (first solve), or "min" or "median" of repeated solves
+amortize_setup = None # Add the setup time amortized over this many solves to the solution times, or None to not add it
+stats_db_file = None # Load the stats of the problems in stats_files from this stats_db.py database instead of the files
 ########################################################################################################################
 
-import pickle
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
+import stats_io
 
 # Scheme aesthetics
 schemes =       ["0" , "1"  ,  "3", "2.40"  , "2.30"  , "2.20"  , "2.10"  , "2.05"  ,
@@ -33,10 +34,10 @@ schm_clr_idxs = [0,        0,    0,      1  ,        2,        3,        4,
                  1   ,        2,        3,        4,        5]
 scheme_styles = ["-" , "--" , "-.", "--"    , "--"    , "--"    , "--"    , "--",
                  "-."     , "-."    , "-."    , "-."    , "-."]
-scheme_labels = map(lambda s: "$" + s + "$", scheme_labels)
+scheme_labels = ["$" + s + "$" for s in scheme_labels]
 
 # Change this to only consider certain schemes
-scheme_idxs = range(len(schemes))
+scheme_idxs = list(range(len(schemes)))
 if len(scheme_idxs) != len(schemes):
     pass
     #~ scheme_styles = ['-', '-', '-', '--', '--']
@@ -44,83 +45,137 @@ if len(scheme_idxs) != len(schemes):
     #~ scheme_styles = ['-', '--']
     #~ schm_clr_idxs = [0, 5]
 
-# Compute scheme colors
-cNorm = matplotlib.colors.Normalize(vmin=0, vmax=6)
-scalarMap = plt.cm.ScalarMappable(norm=cNorm, cmap='nipy_spectral')
-scheme_colors = map(scalarMap.to_rgba, schm_clr_idxs)
-if len(scheme_idxs) == len(schemes):
-    scheme_colors[6] = scheme_colors[11] = (0.95, 0.6, 0.0, 1.0)
-
-# Load stats and define scheme equalities
-statses = dict(zip(stats_files, [pickle.load(open(stats_files[problem], "rb")).values()[0] for problem in stats_files]))
-if "car" in stats_files:
-    statses["car"]["2.10"] = statses["car"]["2.05"]
-    statses["car"]["2.20"] = statses["car"]["1"]
-    statses["car"]["2.30"] = statses["car"]["1"]
-    statses["car"]["2.40"] = statses["car"]["1"]
-    statses["car"]["3"] = statses["car"]["1"]
-    statses["car"]["4.05"] = statses["car"]["2.05"]
-    statses["car"]["4.10"] = statses["car"]["2.10"]
-    statses["car"]["4.20"] = statses["car"]["2.20"]
-    statses["car"]["4.30"] = statses["car"]["2.30"]
-    statses["car"]["4.40"] = statses["car"]["2.40"]
-if "ccpp" in stats_files:
-    statses["ccpp"]["2.10"] = statses["ccpp"]["1"]
-    statses["ccpp"]["2.20"] = statses["ccpp"]["1"]
-    statses["ccpp"]["2.30"] = statses["ccpp"]["1"]
-    statses["ccpp"]["2.40"] = statses["ccpp"]["1"]
-    statses["ccpp"]["4.10"] = statses["ccpp"]["3"]
-    statses["ccpp"]["4.20"] = statses["ccpp"]["3"]
-    statses["ccpp"]["4.30"] = statses["ccpp"]["3"]
-    statses["ccpp"]["4.40"] = statses["ccpp"]["3"]
-if "fourbar1" in stats_files:
-    statses["fourbar1"]["2.30"] = statses["fourbar1"]["1"]
-    statses["fourbar1"]["2.40"] = statses["fourbar1"]["1"]
-if "double_pendulum" in stats_files:
-    statses["double_pendulum"]["2.10"] = statses["double_pendulum"]["1"]
-    statses["double_pendulum"]["2.20"] = statses["double_pendulum"]["1"]
-    statses["double_pendulum"]["2.30"] = statses["double_pendulum"]["1"]
-    statses["double_pendulum"]["2.40"] = statses["double_pendulum"]["1"]
-    statses["double_pendulum"]["4.20"] = statses["double_pendulum"]["3"]
-    statses["double_pendulum"]["4.30"] = statses["double_pendulum"]["3"]
-    statses["double_pendulum"]["4.40"] = statses["double_pendulum"]["3"]
-schemes = [schemes[i] for i in scheme_idxs]
-scheme_labels = [scheme_labels[i] for i in scheme_idxs]
-
-# Compute normalized solution times
-r = {}
-for scheme in schemes:
-    r[scheme] = []
-n_p = 0.
-for problem in statses:
-    stats = statses[problem]
-    n_runs = len(stats.values()[0])
-    for i in xrange(n_runs):
-        times = [stats[scheme][i][3] for scheme in schemes if stats[scheme][i][0] == "Solve_Succeeded"]
-        if len(times) > 0:
-            n_p += 1
-            t_min = np.min(times)
-            for scheme in schemes:
-                if stats[scheme][i][0] == "Solve_Succeeded":
-                    time = stats[scheme][i][3]
-                    r[scheme].append(time / t_min)
-                else:
-                    r[scheme].append(np.inf)
-
-# Plot
-def rho(r, s, tau):
-    return sum(r[s] <= tau)/n_p
-plt.close(1)
-plt.figure(1, figsize=(12, 9))
-plt.rcParams.update(
-    {'legend.fontsize': 24,
-     'axes.labelsize': 28,
-     'xtick.labelsize': 24,
-     'ytick.labelsize': 24})
-taus = np.logspace(0, 2, n_tau)
-for (scheme, color, style) in zip(schemes, scheme_colors, scheme_styles):
-    plt.semilogx(taus, [rho(r, scheme, tau) for tau in taus], color=color, linestyle=style, lw=2)
-plt.legend(scheme_labels, loc='lower right')
-plt.xlabel('$\\tau$')
-plt.ylabel('$\\rho(\\tau)$')
-plt.show()
+def get_scheme_colors():
+    """Compute the scheme colors, which requires matplotlib."""
+    import matplotlib
+    import matplotlib.pyplot as plt
+    cNorm = matplotlib.colors.Normalize(vmin=0, vmax=6)
+    scalarMap = plt.cm.ScalarMappable(norm=cNorm, cmap='nipy_spectral')
+    scheme_colors = [scalarMap.to_rgba(idx) for idx in schm_clr_idxs]
+    if len(scheme_idxs) == len(schemes):
+        scheme_colors[6] = scheme_colors[11] = (0.95, 0.6, 0.0, 1.0)
+    return scheme_colors
+
+def load_statses(stats_files, time_estimate="time", amortize_setup=None):
+    """
+    Load the stats of each problem in stats_files ({problem: stats_file}) and return them as {problem: {scheme: list}}.
+    """
+    statses = {}
+    for problem in stats_files:
+        stats = stats_io.read_stats(stats_files[problem])
+        prb_key = list(stats.keys())[0]
+        extras = stats_io.read_extras(stats_files[problem])
+        prb_stats = stats_io.robust_stats(stats[prb_key], extras['runs'].get(prb_key, {}), time_estimate)
+        prb_stats = stats_io.amortized_stats(prb_stats, extras['setup'].get(prb_key, {}), amortize_setup)
+        statses[problem] = stats_io.drop_lost(prb_stats)
+    return statses
+
+def add_scheme_equalities(statses):
+    """Add the schemes that are identical to other schemes for some problems, and were thus not benchmarked."""
+    if "car" in statses:
+        statses["car"]["2.10"] = statses["car"]["2.05"]
+        statses["car"]["2.20"] = statses["car"]["1"]
+        statses["car"]["2.30"] = statses["car"]["1"]
+        statses["car"]["2.40"] = statses["car"]["1"]
+        statses["car"]["3"] = statses["car"]["1"]
+        statses["car"]["4.05"] = statses["car"]["2.05"]
+        statses["car"]["4.10"] = statses["car"]["2.10"]
+        statses["car"]["4.20"] = statses["car"]["2.20"]
+        statses["car"]["4.30"] = statses["car"]["2.30"]
+        statses["car"]["4.40"] = statses["car"]["2.40"]
+    if "ccpp" in statses:
+        statses["ccpp"]["2.10"] = statses["ccpp"]["1"]
+        statses["ccpp"]["2.20"] = statses["ccpp"]["1"]
+        statses["ccpp"]["2.30"] = statses["ccpp"]["1"]
+        statses["ccpp"]["2.40"] = statses["ccpp"]["1"]
+        statses["ccpp"]["4.10"] = statses["ccpp"]["3"]
+        statses["ccpp"]["4.20"] = statses["ccpp"]["3"]
+        statses["ccpp"]["4.30"] = statses["ccpp"]["3"]
+        statses["ccpp"]["4.40"] = statses["ccpp"]["3"]
+    if "fourbar1" in statses:
+        statses["fourbar1"]["2.30"] = statses["fourbar1"]["1"]
+        statses["fourbar1"]["2.40"] = statses["fourbar1"]["1"]
+    if "double_pendulum" in statses:
+        statses["double_pendulum"]["2.10"] = statses["double_pendulum"]["1"]
+        statses["double_pendulum"]["2.20"] = statses["double_pendulum"]["1"]
+        statses["double_pendulum"]["2.30"] = statses["double_pendulum"]["1"]
+        statses["double_pendulum"]["2.40"] = statses["double_pendulum"]["1"]
+        statses["double_pendulum"]["4.20"] = statses["double_pendulum"]["3"]
+        statses["double_pendulum"]["4.30"] = statses["double_pendulum"]["3"]
+        statses["double_pendulum"]["4.40"] = statses["double_pendulum"]["3"]
+    return statses
+
+def performance_ratios(statses, schemes):
+    """
+    Return (r, n_p), the performance ratios of schemes on the instances solved by some scheme (inf for failures) and
+    their number.
+    """
+    r = {}
+    for scheme in schemes:
+        r[scheme] = []
+    n_p = 0.
+    for problem in statses:
+        stats = statses[problem]
+        n_runs = min(len(stats[scheme]) for scheme in schemes)
+        for i in range(n_runs):
+            times = [stats[scheme][i][3] for scheme in schemes if stats[scheme][i][0] == "Solve_Succeeded"]
+            if len(times) > 0:
+                n_p += 1
+                t_min = np.min(times)
+                for scheme in schemes:
+                    if stats[scheme][i][0] == "Solve_Succeeded":
+                        time = stats[scheme][i][3]
+                        r[scheme].append(time / t_min)
+                    else:
+                        r[scheme].append(np.inf)
+    for scheme in schemes:
+        r[scheme] = np.array(r[scheme])
+    return (r, n_p)
+
+def rho(r, s, tau, n_p):
+    return np.sum(r[s] <= tau)/n_p
+
+def rho_curves(r, n_p, schemes, taus):
+    """Return {scheme: array of rho(tau) for all taus}, computed by sorting the performance ratios once per scheme."""
+    return dict((scheme, np.searchsorted(np.sort(r[scheme]), taus, side='right') / float(n_p)) for scheme in schemes)
+
+def plot_profile(r, n_p, schemes, labels, colors, styles, n_tau=100, figure=1, title=None):
+    taus = np.logspace(0, 2, n_tau)
+    plot_curves(taus, rho_curves(r, n_p, schemes, taus), schemes, labels, colors, styles, figure, title)
+
+def plot_curves(taus, curves, schemes, labels, colors, styles, figure=1, title=None):
+    """Plot the performance profile given by the rho curves of rho_curves."""
+    import matplotlib.pyplot as plt
+    plt.close(figure)
+    plt.figure(figure, figsize=(12, 9))
+    plt.rcParams.update(
+        {'legend.fontsize': 24,
+         'axes.labelsize': 28,
+         'xtick.labelsize': 24,
+         'ytick.labelsize': 24})
+    for (scheme, color, style) in zip(schemes, colors, styles):
+        plt.semilogx(taus, curves[scheme], color=color, linestyle=style, lw=2)
+    plt.legend(labels, loc='lower right')
+    plt.xlabel('$\\tau$')
+    plt.ylabel('$\\rho(\\tau)$')
+    if title is not None:
+        plt.title(title)
+
+if __name__ == "__main__":
+    # Load stats and define scheme equalities
+    if stats_db_file is None:
+        statses = load_statses(stats_files, time_estimate, amortize_setup)
+    else:
+        import stats_db
+        statses = stats_db.statses(stats_db.connect(stats_db_file), list(stats_files), time_estimate, amortize_setup)
+    statses = add_scheme_equalities(statses)
+    schemes = [schemes[i] for i in scheme_idxs]
+    scheme_labels = [scheme_labels[i] for i in scheme_idxs]
+
+    # Compute normalized solution times
+    (r, n_p) = performance_ratios(statses, schemes)
+
+    # Plot
+    import matplotlib.pyplot as plt
+    plot_profile(r, n_p, schemes, scheme_labels, get_scheme_colors(), scheme_styles, n_tau)
+    plt.show()
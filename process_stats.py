@@ -1,175 +1,179 @@
 """
 Prints some numbers for the stats files generated by benchmark.py which are not immediately discernible from the
 performance profile. In particular, generates LaTeX code for the published data tables.
+
+The stats file can also be given as a command line argument, or the runs read from a database of stats_db.py with
+--db. The table subcommand of analyze.py prints the same numbers, with caching.
 """
 
 ################################################## Choose stats file ###################################################
 file_name = 'stats/stats_ccpp_30'
+time_estimate = "time" # Solution time to use: "time" (first solve), or "min" or "median" of repeated solves
 ########################################################################################################################
 
-import pickle
-from IPython.core.debugger import Tracer; dh = Tracer()
-from scipy.stats import norm
-import numpy as np
-
-stats = pickle.load(open(file_name, "rb"))
-
-def comparator(s1, s2):
-    s1_split = s1.split('.')
-    s2_split = s2.split('.')
-    if s1_split[0] < s2_split[0]:
-        return -1
-    elif s1_split[0] > s2_split[0]:
-        return 1
-    elif s1_split[1] < s2_split[1]:
-        return 1
-    elif s1_split[1] > s2_split[1]:
-        return -1
-    else:
-        return 0
-
-failed_status = {}
-failed_status_scheme = {}
-for problem in stats:
-    print("\n" + problem + "\n----------------------------")
-    prb_stats = stats[problem]
-    failed_status[problem] = {}
-    failed_status_scheme[problem] = {}
-    n_runs = len(prb_stats.values()[0])
-    table_schemes = []
+import math
+import stats_io
 
-    # Rename schemes
-    for key in prb_stats.keys():
+def rename_schemes(prb_stats):
+    """
+    Return the stats with the schemes renamed to the numbering of the publications, where schemes 2 and 3 are swapped.
+    """
+    renamed = {}
+    for key in prb_stats:
         key_split = key.split('.')
-        switch = False
         if key_split[0] == "2":
-            key_split[0] = "3"
-            switch = True
+            new_key = "3." + key_split[1]
         elif key_split[0] == "3":
-            key_split[0] = "2"
-            switch = True
-        if switch:
-            new_key = key_split[0]
-            if new_key == "3":
-                new_key += "." + key_split[1]
-            prb_stats[new_key] = prb_stats[key]
-            del prb_stats[key]
-    
-    for scheme in sorted(prb_stats.keys(), comparator):
-        tot_success = 0.
-        tot_full_success = 0.
-        tot_scheme_iter = 0.
-        tot_scheme_time = 0.
-        tot_cost = 0.
-        tot_iter = 0.
-        tot_time = 0.
-        invalid_runs = 0.
-        failed_status[problem][scheme] = {}
-        failed_status_scheme[problem][scheme] = {}
-        for i in xrange(n_runs):
-            (status, iter, cost, time) = prb_stats[scheme][i]
-            if status == "Solve_Succeeded":
-                tot_success += 1
-                tot_scheme_time += time
-                tot_scheme_iter += iter
-                if all([status == prb_stats[schm][i][0] for schm in prb_stats.keys()]):
-                    tot_full_success += 1
-                    tot_iter += iter
-                    tot_time += time
-                    tot_cost += cost
-            else:
-                try:
-                    failed_status_scheme[problem][scheme][status] += 1
-                except KeyError:
-                    failed_status_scheme[problem][scheme][status] = 1
-                if all(["Solve_Succeeded" != prb_stats[schm][i][0] for schm in prb_stats.keys()]):
-                    invalid_runs += 1
-                else:
-                    try:
-                        failed_status[problem][scheme][status] += 1
-                    except KeyError:
-                        failed_status[problem][scheme][status] = 1
+            new_key = "2"
+        else:
+            new_key = key
+        renamed[new_key] = prb_stats[key]
+    return renamed
+
+def sorted_schemes(schemes):
+    """Sort schemes by number, and schemes with the same number by decreasing density tolerance."""
+    schemes = sorted(schemes, key=lambda scheme: scheme.split('.')[1] if '.' in scheme else '', reverse=True)
+    return sorted(schemes, key=lambda scheme: scheme.split('.')[0])
 
-        # Compute scheme time standard deviation
-        if tot_full_success > 0:
-            avg_time = tot_time/tot_full_success
-        if tot_full_success > 1:
-            scheme_std_dev = 0.
-            for i in xrange(n_runs):
-                (status, iter, cost, time) = prb_stats[scheme][i]
-                if status == "Solve_Succeeded":
-                    if all([status == prb_stats[schm][i][0] for schm in prb_stats.keys()]):
-                        scheme_std_dev += (time - avg_time)**2
-            scheme_std_dev = np.sqrt(scheme_std_dev/(tot_full_success-1))
+def _count(counts, status):
+    counts[status] = counts.get(status, 0) + 1
+
+def problem_table(prb_stats):
+    """
+    Compute the numbers of the data tables for the schemes of a problem, renamed as in the publications, and return a
+    dict with the run counts and the scheme rows in table order.
+    """
+    prb_stats = rename_schemes(prb_stats)
+    schemes = sorted_schemes(prb_stats.keys())
+    n_runs = len(list(prb_stats.values())[0])
+    full_success = [all(prb_stats[scheme][i][0] == "Solve_Succeeded" for scheme in schemes) for i in range(n_runs)]
+    invalid = [all(prb_stats[scheme][i][0] != "Solve_Succeeded" for scheme in schemes) for i in range(n_runs)]
+    n_full_success = sum(full_success)
+    n_invalid = sum(invalid)
+    n_valid = n_runs - n_invalid
+    rows = []
+    for scheme in schemes:
+        runs = prb_stats[scheme]
+        success = [run for run in runs if run[0] == "Solve_Succeeded"]
+        full = [runs[i] for i in range(n_runs) if full_success[i]]
+        failed = {}
+        failed_scheme = {}
+        for i in range(n_runs):
+            if runs[i][0] != "Solve_Succeeded":
+                _count(failed_scheme, runs[i][0])
+                if not invalid[i]:
+                    _count(failed, runs[i][0])
+        row = {'scheme': scheme, 'n_success': len(success), 'failed': failed, 'failed_scheme': failed_scheme}
+        row['success_rate'] = float(len(success)) / n_valid if n_valid > 0 else 0.
+        row['confidence'] = 100*1.959963984540054*math.sqrt(row['success_rate']*(1. - row['success_rate'])/n_valid) \
+                            if n_valid > 0 else float('nan') # 1.96 is the 97.5% quantile of the normal distribution
+        if len(full) > 0:
+            row['avg_time'] = sum(run[3] for run in full) / len(full)
+            row['avg_iter'] = sum(run[1] for run in full) / float(len(full))
+            row['avg_cost'] = sum(run[2] for run in full) / len(full)
+        if len(full) > 1:
+            row['time_std_dev'] = math.sqrt(sum((run[3] - row['avg_time'])**2 for run in full) / (len(full) - 1))
         else:
-            scheme_std_dev = np.inf
-        
-        valid_runs = n_runs - invalid_runs
-        print('Scheme %s' % scheme)
-        if tot_success > 0:
-            success_rate = tot_success/valid_runs
-            print('Success rate: %.1f%%' % (100*success_rate))
-            conf = (100*norm.ppf(0.975)*np.sqrt(success_rate*(1.-success_rate)/valid_runs))
-            print('95%% Confidence: %.1f%%' % conf)
-            if tot_full_success > 0:
-                print('Average time: %.2e' % avg_time)
-                print('Time standard deviation: %.2e' % scheme_std_dev)
-                print('Average iter: %.1f' % (tot_iter/tot_full_success))
-                print('Average cost: %.2e' % (tot_cost/tot_full_success))
+            row['time_std_dev'] = float('inf')
+        if len(success) > 0:
+            row['scheme_avg_time'] = sum(run[3] for run in success) / len(success)
+            row['scheme_avg_iter'] = sum(run[1] for run in success) / float(len(success))
+        rows.append(row)
+    return {'n_runs': n_runs, 'n_valid': n_valid, 'n_full_success': n_full_success, 'n_invalid': n_invalid,
+            'rows': rows}
+
+def print_problem_table(problem, table):
+    print("\n" + problem + "\n----------------------------")
+    for row in table['rows']:
+        print('Scheme %s' % row['scheme'])
+        if row['n_success'] > 0:
+            print('Success rate: %.1f%%' % (100*row['success_rate']))
+            print('95%% Confidence: %.1f%%' % row['confidence'])
+            if table['n_full_success'] > 0:
+                print('Average time: %.2e' % row['avg_time'])
+                print('Time standard deviation: %.2e' % row['time_std_dev'])
+                print('Average iter: %.1f' % row['avg_iter'])
+                print('Average cost: %.2e' % row['avg_cost'])
             else:
                 print('One scheme failed all instances! Time and iter considering only this scheme:')
-                print('\tAverage time: %.2e' % (tot_scheme_time/tot_success))
-                print('\tAverage iter: %.1f' % (tot_scheme_iter/tot_success))
+                print('\tAverage time: %.2e' % row['scheme_avg_time'])
+                print('\tAverage iter: %.1f' % row['scheme_avg_iter'])
         else:
-            success_rate = 0.
             print('Success rate: 0%')
             print('Average time: inf')
             print('Average iter: inf')
         print('Failure statuses:')
-        n_fail = valid_runs - tot_success
-        for (k, v) in failed_status[problem][scheme].iteritems():
-            print('\t%s: %d%%' % (k, int(round(100*v/n_fail))))
+        n_fail = table['n_valid'] - row['n_success']
+        for (k, v) in row['failed'].items():
+            print('\t%s: %d%%' % (k, int(round(100.*v/n_fail))))
         print('\n')
         print('Scheme failure statuses:')
-        n_fail_scheme = n_runs - tot_success
-        for (k, v) in failed_status_scheme[problem][scheme].iteritems():
-            print('\t%s: %d%%' % (k, int(round(100*v/n_fail_scheme))))
+        n_fail_scheme = table['n_runs'] - row['n_success']
+        for (k, v) in row['failed_scheme'].items():
+            print('\t%s: %d%%' % (k, int(round(100.*v/n_fail_scheme))))
         print('\n')
-
-        table_scheme = ""
-        name_split = scheme.split('.')
-        if len(name_split) > 1:
-            scheme_name = name_split[0] + "_{" + name_split[1].lstrip("0") + "}"
-        else:
-            scheme_name = name_split[0]
-        table_scheme += "$" + scheme_name +  "$"
-        table_scheme += " & " + '%.1f\%%' % (100*success_rate)
-        if tot_full_success > 0:
-            #~ table_scheme += " & " + '%.1f\%%' % conf
-            table_scheme += " & " + '%.1f' % avg_time
-            table_scheme += " & " + '%.1f' % scheme_std_dev
-            table_scheme += " & " + '%.1f' % (tot_iter/tot_full_success)
-        table_schemes.append(table_scheme + " \\\\\n")
     print("Runs: %d\nValid runs: %d\nFull success runs: %d\nInvalid runs: %d" %
-          (n_runs, int(round(valid_runs)), int(round(tot_full_success)), int(round(invalid_runs))))
+          (table['n_runs'], table['n_valid'], table['n_full_success'], table['n_invalid']))
 
-    # Generate LaTeX code for table
-    table = """
+def latex_table(problem, table):
+    """Return LaTeX code for the data table of a problem."""
+    latex = """
 \\begin{table}[ht]
 \\centering
 \\tbl{Scheme performances on %d instances of %s.
-On %.1f\%% of the instances, all schemes successfully solved the problem.
-On %.1f\%% of the instances, all schemes failed.}
+On %.1f\\%% of the instances, all schemes successfully solved the problem.
+On %.1f\\%% of the instances, all schemes failed.}
 {\\begin{tabular}[l]{@{}ccccc}
 \\toprule
-\\textsc{Scheme} & Success & Time & $\sigma_t$ & Iter \\\\
+\\textsc{Scheme} & Success & Time & $\\sigma_t$ & Iter \\\\
 \\midrule
-""" % (n_runs, problem, 100*tot_full_success/n_runs, 100*invalid_runs/n_runs)
-    for tbl_schm in table_schemes:
-        table += tbl_schm
-    table += """\\bottomrule
+""" % (table['n_runs'], problem, 100.*table['n_full_success']/table['n_runs'],
+       100.*table['n_invalid']/table['n_runs'])
+    for row in table['rows']:
+        name_split = row['scheme'].split('.')
+        if len(name_split) > 1:
+            scheme_name = name_split[0] + "_{" + name_split[1].lstrip("0") + "}"
+        else:
+            scheme_name = name_split[0]
+        table_scheme = "$" + scheme_name + "$"
+        table_scheme += " & " + '%.1f\\%%' % (100*row['success_rate'])
+        if table['n_full_success'] > 0:
+            table_scheme += " & " + '%.1f' % row['avg_time']
+            table_scheme += " & " + '%.1f' % row['time_std_dev']
+            table_scheme += " & " + '%.1f' % row['avg_iter']
+        latex += table_scheme + " \\\\\n"
+    latex += """\\bottomrule
 \\end{tabular}}
 \\label{tab:xxx}
 \\end{table}
 """
-    print(table)
+    return latex
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Numbers and LaTeX tables of a stats file or stats database.")
+    parser.add_argument('file', nargs='?', default=file_name)
+    parser.add_argument('--db', default=None, help="read the runs from this stats_db.py database instead of a file")
+    parser.add_argument('--problem', nargs='+', default=None, help="problems in the database (default: all)")
+    parser.add_argument('--std-dev', type=int, default=None, help="filter of the database, see stats_db.py")
+    parser.add_argument('--options', default=None, help="filter of the database, see stats_db.py")
+    parser.add_argument('--backend', default=None, help="filter of the database, see stats_db.py")
+    args = parser.parse_args()
+    if args.db is None:
+        stats = stats_io.read_stats(args.file)
+        extras = stats_io.read_extras(args.file)
+        statses = dict((problem, stats_io.drop_lost(stats_io.robust_stats(
+                                stats[problem], extras['runs'].get(problem, {}), time_estimate)))
+                       for problem in stats)
+    else:
+        import stats_db
+        connection = stats_db.connect(args.db)
+        problems = args.problem
+        if problems is None:
+            problems = [row[0] for row in connection.execute("SELECT DISTINCT problem FROM runs ORDER BY problem")]
+        statses = stats_db.statses(connection, problems, time_estimate, std_dev=args.std_dev, options=args.options,
+                                   backend=args.backend)
+    for problem in statses:
+        table = problem_table(statses[problem])
+        print_problem_table(problem, table)
+        print(latex_table(problem, table))
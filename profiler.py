@@ -0,0 +1,89 @@
+"""
+Low-overhead statistical profiler for the Python side of the benchmark solves.
+
+The Python stack of the main thread is sampled on SIGPROF (Unix only), and each sample is weighted by the CPU time since
+the previous one, since a long native call such as the IPOPT solve is only sampled once it returns. The samples are
+aggregated as collapsed stacks, {"outermost;...;innermost": seconds}, the input format of flamegraph.pl.
+"""
+
+import os
+import sys
+import time
+import signal
+
+try:
+    _cpu_time = time.process_time
+except AttributeError:
+    _cpu_time = time.clock # Python 2, where time.clock is the process CPU time on Unix
+
+def frame_label(code):
+    return '%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+class SamplingProfiler(object):
+    """
+    Context manager that samples the Python stack while active and adds the samples to stacks, which can be shared.
+    """
+
+    def __init__(self, stacks=None, interval=0.005):
+        if stacks is None:
+            stacks = {}
+        self.stacks = stacks
+        self.interval = interval
+        self._last = None
+        self._old_handler = None
+        self._old_timer = None
+
+    def _sample(self, signum, frame):
+        now = _cpu_time()
+        weight = now - self._last
+        self._last = now
+        labels = []
+        while frame is not None:
+            if frame.f_code not in _own_codes: # Skip the profiler itself, when a signal interrupts the handler
+                labels.append(frame_label(frame.f_code))
+            frame = frame.f_back
+        stack = ';'.join(reversed(labels))
+        self.stacks[stack] = self.stacks.get(stack, 0.) + weight
+
+    def __enter__(self):
+        self._last = _cpu_time()
+        self._old_handler = signal.signal(signal.SIGPROF, self._sample)
+        # Restart the system calls interrupted by the samples, instead of failing them with EINTR in IPOPT or CasADi
+        signal.siginterrupt(signal.SIGPROF, False)
+        self._old_timer = signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        signal.setitimer(signal.ITIMER_PROF, *self._old_timer)
+        self._sample(None, sys._getframe(1)) # The CPU time since the last sample
+        # A handler that was not installed from Python is returned as None, restore the default handler then
+        signal.signal(signal.SIGPROF, self._old_handler if self._old_handler is not None else signal.SIG_DFL)
+        return False
+
+_own_codes = set([SamplingProfiler.__dict__['_sample'].__code__, frame_label.__code__])
+
+def write_collapsed(stacks, file_name):
+    """Write stacks in the collapsed format of flamegraph.pl, with the sample weights in microseconds."""
+    with open(file_name, 'w') as f:
+        for stack in sorted(stacks):
+            weight = int(round(1e6*stacks[stack]))
+            if weight > 0:
+                f.write('%s %d\n' % (stack, weight))
+
+def top_functions(stacks, n=20):
+    """Return the n functions with the most self time in stacks, as a list of (function, self time, total time)."""
+    self_times = {}
+    total_times = {}
+    for (stack, weight) in stacks.items():
+        labels = stack.split(';')
+        self_times[labels[-1]] = self_times.get(labels[-1], 0.) + weight
+        for label in set(labels):
+            total_times[label] = total_times.get(label, 0.) + weight
+    functions = sorted(self_times, key=lambda label: -self_times[label])[:n]
+    return [(label, self_times[label], total_times[label]) for label in functions]
+
+def print_top_functions(stacks, n=20):
+    total = sum(stacks.values())
+    print('%10s %10s %7s  %s' % ("Self [s]", "Total [s]", "Self %", "Function"))
+    for (label, self_time, total_time) in top_functions(stacks, n):
+        print('%10.3f %10.3f %6.1f%%  %s' % (self_time, total_time, 100*self_time/max(total, 1e-12), label))
@@ -0,0 +1,182 @@
+"""
+Replay backend, which stands in for the JModelica.org solvers of benchmark.py by replaying recorded solver statistics.
+
+A replayed instance draws one of the instances of a stats file, and each scheme returns its recorded statistics for it,
+so that the correlations between the schemes are kept. The times can be perturbed with log-normal noise, and the solves
+can sleep or burn CPU for the replayed time times time_scale. The backend is used by benchmark.py with
+backend = "replay" and by distributed.py with --replay.
+
+Running this script load-tests the benchmark pipeline (benchmark, resume, performance profile and process_stats.py),
+prints the throughput of each stage and exits with a nonzero status if the replayed stats do not match the recorded
+ones.
+"""
+
+######################################################## Setup #########################################################
+# dict with problem: stats file to replay
+stats_files = {'car': 'stats/stats_car_10',
+               'ccpp': 'stats/stats_ccpp_30',
+               'double_pendulum': 'stats/stats_double_pendulum_30',
+               'fourbar1': 'stats/stats_fourbar1_3',
+               'dist': 'stats/stats_dist_30'}
+load = None # Mimic the load of a solve: None, "sleep" or "cpu" for the replayed time times time_scale
+time_scale = 1. # Factor on the replayed time when mimicking the load
+time_noise = 0. # Standard deviation of the log-normal noise on the replayed times
+n_total = 100000 # Total number of solves of the load test, spread evenly over problems and schemes
+########################################################################################################################
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import stats_io
+
+try:
+    _cpu_time = time.process_time
+except AttributeError:
+    _cpu_time = time.clock # Python 2, where time.clock is the process CPU time on Unix
+
+def fit(stats_file):
+    """Return the replay model of the stats file, {scheme: [(status, iter, cost, time), ...]}, of a single problem."""
+    stats = stats_io.read_stats(stats_file)
+    prb_stats = stats_io.drop_lost(list(stats.values())[0])
+    n_runs = min(len(prb_stats[scheme]) for scheme in prb_stats)
+    return dict((scheme, [tuple(run) for run in prb_stats[scheme][:n_runs]]) for scheme in prb_stats)
+
+def generate_instances(n_runs):
+    """
+    Generate n_runs replay instances, each a list with a random number in [0, 1) that selects the recorded instance.
+    """
+    np.random.seed(1)
+    return [[u] for u in np.random.random(n_runs)]
+
+def _burn(seconds):
+    end = _cpu_time() + seconds
+    while _cpu_time() < end:
+        pass
+
+class ReplayResult(object):
+    def __init__(self, stats):
+        self.stats = stats
+
+    def get_solver_statistics(self):
+        return self.stats
+
+class ReplaySolver(object):
+    """Stand-in for a prepared JModelica.org optimization solver, which replays the recorded runs of a scheme."""
+
+    def __init__(self, runs, load=None, time_scale=1., time_noise=0., seed=None):
+        self.runs = runs
+        self.load = load
+        self.time_scale = time_scale
+        self.time_noise = time_noise
+        self.rng = np.random.RandomState(seed)
+        self.instance = 0.
+
+    def set(self, names, values):
+        """Select the recorded instance to replay by the first value of the instance given by generate_instances."""
+        if isinstance(values, (list, tuple, np.ndarray)):
+            values = values[0]
+        self.instance = values
+
+    def optimize(self):
+        (status, iter, cost, solve_time) = self.runs[int(self.instance*len(self.runs)) % len(self.runs)]
+        if self.time_noise > 0:
+            solve_time *= np.exp(self.time_noise*self.rng.standard_normal())
+        if self.load == "sleep":
+            time.sleep(self.time_scale*solve_time)
+        elif self.load == "cpu":
+            _burn(self.time_scale*solve_time)
+        elif self.load is not None:
+            raise ValueError("Unknown replay load %s." % self.load)
+        return ReplayResult((status, iter, cost, solve_time))
+
+def setup_info():
+    """Return the setup information of a replayed scheme, where nothing is set up."""
+    info = dict((phase + '_time', 0.) for phase in ['transfer', 'elimination', 'prepare', 'total'])
+    info.update(dict((phase + '_memory', None) for phase in ['transfer', 'elimination', 'prepare', 'peak']))
+    return info
+
+### Load test ###
+def _timed(results, stage, n_solves, function, *args, **kwargs):
+    t0 = time.time()
+    value = function(*args, **kwargs)
+    results.append((stage, time.time() - t0, n_solves))
+    return value
+
+def success_rates(prb_stats):
+    return dict((scheme, np.mean([run[0] == "Solve_Succeeded" for run in prb_stats[scheme]]))
+                for scheme in prb_stats)
+
+def check_replay(prb_stats, model, tol=4.):
+    """
+    Return the schemes whose replayed success rate differs from their replay model by more than tol standard errors.
+    """
+    replayed = success_rates(prb_stats)
+    recorded = success_rates(model)
+    failed = []
+    for scheme in replayed:
+        n_runs = len(prb_stats[scheme])
+        std_err = np.sqrt(max(recorded[scheme]*(1. - recorded[scheme]), 1./n_runs)/n_runs)
+        if abs(replayed[scheme] - recorded[scheme]) > tol*std_err:
+            failed.append(scheme)
+    return failed
+
+def load_test(problems, n_total, directory):
+    """
+    Run the load test of the benchmark pipeline on problems and return (timings, failed), where timings lists (stage,
+    seconds, number of solves) and failed lists the (problem, scheme) whose replayed stats do not match.
+    """
+    import benchmark
+    import performance_profile
+    benchmark.backend = "replay"
+    n_schemes = dict((problem, len(benchmark.schemes[problem])) for problem in problems)
+    n_runs = max(1, n_total // sum(n_schemes.values()))
+    n_first = max(1, n_runs // 2)
+    timings = []
+    # One problem per stats file, as expected by the analysis scripts
+    file_names = [_timed(timings, 'benchmark %s (%d instances)' % (problem, n_first), n_first*n_schemes[problem],
+                         benchmark.run_benchmark, [problem], n_first, directory=directory)[0]
+                  for problem in problems]
+    file_names = [_timed(timings, 'resume %s (%d instances)' % (problem, n_runs), (n_runs - n_first)*n_schemes[problem],
+                         benchmark.run_benchmark, [problem], n_runs, file_name, directory=directory)[0]
+                  for (problem, file_name) in zip(problems, file_names)]
+    statses = _timed(timings, 'load stats', None, performance_profile.load_statses, dict(zip(problems, file_names)))
+    performance_profile.add_scheme_equalities(statses)
+    (r, n_p) = _timed(timings, 'performance ratios', None, performance_profile.performance_ratios, statses,
+                      performance_profile.schemes)
+    taus = np.logspace(0, 2, performance_profile.n_tau)
+    _timed(timings, 'performance profile', None, performance_profile.rho_curves, r, n_p, list(r.keys()), taus)
+    for file_name in file_names:
+        with open(os.devnull, 'w') as devnull:
+            returncode = _timed(timings, 'process_stats.py %s' % os.path.basename(file_name), None, subprocess.call,
+                                [sys.executable, 'process_stats.py', file_name], stdout=devnull)
+        if returncode != 0:
+            print('process_stats.py failed on %s with exit status %d.' % (file_name, returncode))
+    failed = []
+    for problem in problems:
+        model = fit(stats_files[problem])
+        replayed = dict((scheme, statses[problem][scheme]) for scheme in model)
+        failed += [(problem, scheme) for scheme in check_replay(replayed, model)]
+        if any(len(statses[problem][scheme]) != n_runs for scheme in benchmark.schemes[problem]):
+            failed.append((problem, None))
+    return (timings, failed)
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp(prefix='replay_')
+    problems = sorted(stats_files)
+    try:
+        (timings, failed) = load_test(problems, n_total, directory)
+    finally:
+        shutil.rmtree(directory)
+    print("\nLoad test of %d solves on %s:" % (n_total, ", ".join(problems)))
+    print('%-55s %10s %12s' % ("Stage", "Time [s]", "Solves/s"))
+    for (stage, seconds, n_solves) in timings:
+        throughput = '%12.0f' % (n_solves/max(seconds, 1e-9)) if n_solves is not None else ''
+        print('%-55s %10.2f %s' % (stage, seconds, throughput))
+    if len(failed) > 0:
+        print("Replayed stats do not match the recorded stats for: " +
+              ", ".join('%s scheme %s' % (problem, scheme) for (problem, scheme) in failed))
+        sys.exit(1)
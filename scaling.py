@@ -0,0 +1,111 @@
+"""
+Analyze the scaling files generated by the scaling study of benchmark.py.
+
+For each problem and scheme, the median time, iterations and solve memory of the successful solves are computed at each
+discretization, and empirical scaling exponents in the number of collocation points n_e*n_cp are fitted in log-log scale
+and used to predict the times at the production discretization.
+"""
+
+######################################################## Setup #########################################################
+scaling_files = ['stats/scaling_dist_30_0000000000'] # Scaling files to analyze
+predict_n_e = {'car': 240, 'ccpp': 160, 'double_pendulum': 400, 'fourbar1': 240, 'dist': 80} # Production n_e
+time_key = "time" # Solution time to use: "time" (first solve) or "time_median" (median of repeated solves)
+########################################################################################################################
+
+import pickle
+import numpy as np
+
+def load_records(file_names):
+    records = []
+    for file_name in file_names:
+        records += pickle.load(open(file_name, "rb"))
+    return records
+
+def aggregate(records, time_key="time"):
+    """
+    Aggregate records per problem, scheme and discretization into {problem: {scheme: [point, ...]}}, sorted by size.
+    """
+    groups = {}
+    for record in records:
+        key = (record['problem'], record['scheme'], record['n_e'], record['n_cp'])
+        groups.setdefault(key, []).append(record)
+    points = {}
+    for ((problem, scheme, n_e, n_cp), group) in groups.items():
+        success = [record for record in group if record['status'] == "Solve_Succeeded"]
+        memory = [record['memory_increase'] for record in success if record.get('memory_increase') is not None]
+        point = {'size': n_e*n_cp, 'n_e': n_e, 'n_cp': n_cp,
+                 'success_rate': float(len(success)) / len(group),
+                 'time': np.median([record.get(time_key, record['time']) for record in success]) if success else np.nan,
+                 'iter': np.median([record['iter'] for record in success]) if success else np.nan,
+                 'memory': np.median(memory) if memory else np.nan,
+                 'n_var': group[0].get('n_var'),
+                 'n_con': group[0].get('n_con')}
+        points.setdefault(problem, {}).setdefault(scheme, []).append(point)
+    for problem in points:
+        for scheme in points[problem]:
+            points[problem][scheme].sort(key=lambda point: point['size'])
+    return points
+
+def fit_exponent(sizes, values):
+    """Fit values = c * sizes**p in log-log scale and return (p, c), or (nan, nan) with fewer than two valid values."""
+    sizes = np.asarray(sizes, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = np.isfinite(values) & (values > 0)
+    if np.sum(valid) < 2:
+        return (np.nan, np.nan)
+    (p, log_c) = np.polyfit(np.log(sizes[valid]), np.log(values[valid]), 1)
+    return (p, np.exp(log_c))
+
+def scaling_table(points, predict_n_e):
+    """Return {problem: {scheme: row}} with the exponents p_time, p_iter and p_memory and the predicted time."""
+    table = {}
+    for problem in points:
+        table[problem] = {}
+        for scheme in points[problem]:
+            scheme_points = points[problem][scheme]
+            sizes = [point['size'] for point in scheme_points]
+            (p_time, c_time) = fit_exponent(sizes, [point['time'] for point in scheme_points])
+            row = {'p_time': p_time,
+                   'p_iter': fit_exponent(sizes, [point['iter'] for point in scheme_points])[0],
+                   'p_memory': fit_exponent(sizes, [point['memory'] for point in scheme_points])[0],
+                   'predicted_time': np.nan}
+            if problem in predict_n_e:
+                size = predict_n_e[problem] * max(point['n_cp'] for point in scheme_points)
+                row['predicted_time'] = c_time * size**p_time
+            table[problem][scheme] = row
+    return table
+
+def print_table(table, predict_n_e):
+    for problem in sorted(table):
+        print("\n" + problem + "\n----------------------------")
+        print('%-8s %8s %8s %8s %12s' % ("Scheme", "p_time", "p_iter", "p_mem", "Pred. time"))
+        for scheme in sorted(table[problem]):
+            row = table[problem][scheme]
+            print('%-8s %8.2f %8.2f %8.2f %12.2e' %
+                  (scheme, row['p_time'], row['p_iter'], row['p_memory'], row['predicted_time']))
+        predicted = dict((scheme, table[problem][scheme]['predicted_time']) for scheme in table[problem]
+                         if np.isfinite(table[problem][scheme]['predicted_time']))
+        if problem in predict_n_e and len(predicted) > 0:
+            print('Predicted fastest scheme at n_e = %d: %s' %
+                  (predict_n_e[problem], min(predicted, key=predicted.get)))
+
+def plot_scaling(points, table):
+    import matplotlib.pyplot as plt
+    for problem in sorted(points):
+        plt.figure(figsize=(12, 9))
+        for scheme in sorted(points[problem]):
+            scheme_points = points[problem][scheme]
+            sizes = np.array([point['size'] for point in scheme_points], dtype=float)
+            plt.loglog(sizes, [point['time'] for point in scheme_points], 'o-', lw=2,
+                       label='%s ($p = %.2f$)' % (scheme, table[problem][scheme]['p_time']))
+        plt.title(problem)
+        plt.xlabel('$n_e n_{cp}$')
+        plt.ylabel('Median time [s]')
+        plt.legend(loc='upper left')
+    plt.show()
+
+if __name__ == "__main__":
+    points = aggregate(load_records(scaling_files), time_key)
+    table = scaling_table(points, predict_n_e)
+    print_table(table, predict_n_e)
+    plot_scaling(points, table)
@@ -0,0 +1,268 @@
+"""
+Per-instance scheme selector (algorithm portfolio), trained on stats files generated by benchmark.py.
+
+The selector predicts the success probability and time of each scheme on a new instance from the k nearest training
+instances of the same problem, in features given by the relative deviations of the initial state from the nominal one
+and their norm. It selects the fastest scheme that is likely enough to succeed, preferring the sparsest NLP among near
+ties, and a parallel fallback portfolio of portfolio_size schemes that greedily covers the neighbours.
+
+Running this script cross-validates the selector, the portfolio and the single best scheme against the virtual best
+scheme of each instance. Only stats files whose extras contain the instances can be used, and the selector is applied to
+the applied values x0 of new initial states (see benchmark.applied_state):
+    selector = train(['stats/stats_dist_30_0000000000'], 'dist')
+    scheme = selector.schemes[selector.select([x0])[0]]
+"""
+
+######################################################## Setup #########################################################
+# dict with problem: list of stats files of the problem with recorded initial states
+stats_files = {'dist': ['stats/stats_dist_30_0000000000']}
+time_estimate = "time" # Solution time to use: "time" (first solve), or "min" or "median" of repeated solves
+n_neighbors = 15 # Number of nearest training instances on which the predictions are based
+min_success = 0.8 # Smallest predicted success probability of a selected scheme
+tie_tolerance = 0.05 # Relative predicted time difference within which the scheme with the sparsest NLP is preferred
+distance_weight = 1. # Weight of the distance from the nominal initial state among the features
+portfolio_size = 2 # Number of schemes of the parallel fallback portfolio
+n_folds = 5 # Number of folds of the cross-validation
+report_taus = [1., 1.1, 1.5, 2., 5.] # Values of tau at which rho is printed
+########################################################################################################################
+
+import numpy as np
+import stats_io
+import stats_db
+
+def instance_features(instances, nominal, distance_weight=1.):
+    """
+    Return the features of instances (a list of initial states), the scaled relative deviations from nominal followed by
+    their norm times distance_weight, as an array of shape (n_instances, n_states + 1).
+    """
+    x0 = np.atleast_2d(np.asarray(instances, dtype=float))
+    nominal = np.asarray(nominal, dtype=float)
+    scale = np.where(nominal != 0, np.abs(nominal), 1.)
+    deviations = (x0 - nominal) / scale / np.sqrt(x0.shape[1])
+    distances = np.sqrt((deviations**2).sum(axis=1))
+    return np.hstack([deviations, distance_weight*distances[:, None]])
+
+def structure_costs(schemes, setup):
+    """
+    Return the number of nonzeros of the NLP Jacobian and Hessian of each scheme, from the setup information of a
+    problem, or zeros if it is not recorded for all schemes.
+    """
+    costs = []
+    for scheme in schemes:
+        info = setup.get(scheme, {})
+        if info.get('nnz_jac') is None or info.get('nnz_hess') is None:
+            return np.zeros(len(schemes))
+        costs.append(float(info['nnz_jac'] + info['nnz_hess']))
+    return np.array(costs)
+
+def load_training(file_names, problem, time_estimate="time"):
+    """
+    Load the instances of problem from stats files and return (instances, nominal, prb_stats, setup), concatenated over
+    the files, with nominal None if it is not recorded.
+    """
+    instances = []
+    nominal = None
+    prb_stats = None
+    setup = {}
+    for file_name in file_names:
+        stats = stats_io.read_stats(file_name)
+        key = stats_db.problem_key(stats, problem)
+        if key is None:
+            raise ValueError("Problem %s is not in %s." % (problem, file_name))
+        extras = stats_io.read_extras(file_name)
+        file_instances = extras['instances'].get(key, [])
+        file_stats = stats_io.robust_stats(stats[key], extras['runs'].get(key, {}), time_estimate)
+        n_runs = min([len(file_instances)] + [len(file_stats[scheme]) for scheme in file_stats])
+        if n_runs == 0:
+            raise ValueError("%s has no recorded initial states of %s." % (file_name, problem))
+        file_stats = dict((scheme, runs[:n_runs]) for (scheme, runs) in file_stats.items())
+        lost = stats_io.lost_instances(file_stats)
+        file_instances = [x0 for (i, x0) in enumerate(file_instances[:n_runs]) if i not in lost]
+        file_stats = stats_io.drop_lost(file_stats, lost)
+        n_runs = len(file_instances)
+        instances += file_instances[:n_runs]
+        if nominal is None:
+            nominal = extras['nominal'].get(key)
+        setup.update(extras['setup'].get(key, {}))
+        if prb_stats is None:
+            prb_stats = dict((scheme, list(runs[:n_runs])) for (scheme, runs) in file_stats.items())
+        else:
+            prb_stats = dict((scheme, prb_stats[scheme] + list(file_stats[scheme][:n_runs]))
+                             for scheme in prb_stats if scheme in file_stats)
+    return (instances, nominal, prb_stats, setup)
+
+def _choose(p, t, costs, min_success=0.8, tie_tolerance=0.05):
+    """Return the index of the selected scheme for each row of the predicted probabilities p and times t."""
+    likely = p >= min_success
+    # Without likely successful schemes, choose among the most likely successful ones
+    unlikely = ~likely.any(axis=1)
+    likely[unlikely] = p[unlikely] == p[unlikely].max(axis=1)[:, None]
+    times = np.where(likely, t, np.inf)
+    close = likely & (times <= (1. + tie_tolerance)*times.min(axis=1)[:, None])
+    close_costs = np.where(close, costs, np.inf)
+    close &= close_costs == close_costs.min(axis=1)[:, None]
+    # Finite keys, so that a close scheme is chosen also if no neighbour was solved
+    return np.argmin(np.where(close, np.minimum(t, np.finfo(float).max), np.inf), axis=1)
+
+class Selector(object):
+    """Selects schemes for instances of a problem from their nearest training instances, see the module docstring."""
+
+    def __init__(self, instances, prb_stats, nominal=None, setup=None, n_neighbors=15, min_success=0.8,
+                 tie_tolerance=0.05, distance_weight=1.):
+        self.schemes = sorted(prb_stats)
+        n_runs = min([len(instances)] + [len(prb_stats[scheme]) for scheme in self.schemes])
+        self.nominal = np.mean(instances[:n_runs], axis=0) if nominal is None else np.asarray(nominal, dtype=float)
+        self.distance_weight = distance_weight
+        self.features = instance_features(instances[:n_runs], self.nominal, distance_weight)
+        times = np.array([[run[3] for run in prb_stats[scheme][:n_runs]] for scheme in self.schemes], dtype=float).T
+        self.success = np.array([[run[0] == "Solve_Succeeded" for run in prb_stats[scheme][:n_runs]]
+                                 for scheme in self.schemes], dtype=bool).T & (times > 0)
+        self.log_times = np.log(np.where(self.success, times, 1.))
+        self.costs = structure_costs(self.schemes, setup or {})
+        self.n_neighbors = n_runs if n_neighbors is None else min(n_neighbors, n_runs)
+        self.min_success = min_success
+        self.tie_tolerance = tie_tolerance
+
+    def neighbors(self, instances):
+        """Return the indices of the nearest training instances of instances, of shape (n_instances, n_neighbors)."""
+        features = instance_features(instances, self.nominal, self.distance_weight)
+        if self.n_neighbors == len(self.features):
+            return np.tile(np.arange(len(self.features)), (len(features), 1))
+        distances = ((features**2).sum(axis=1)[:, None] + (self.features**2).sum(axis=1)[None, :] -
+                     2*features.dot(self.features.T))
+        return np.argpartition(distances, self.n_neighbors - 1, axis=1)[:, :self.n_neighbors]
+
+    def _predict(self, neighbors):
+        success = self.success[neighbors]
+        n_success = success.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(n_success > 0, np.exp(np.where(success, self.log_times[neighbors], 0.).sum(axis=1) /
+                                               n_success), np.inf)
+        return (n_success / float(neighbors.shape[1]), t)
+
+    def predict(self, instances):
+        """
+        Predict the success probability and time (inf without solved neighbours) of each scheme on instances, as arrays
+        of shape (n_instances, n_schemes).
+        """
+        return self._predict(self.neighbors(instances))
+
+    def select(self, instances):
+        """Return the index in schemes of the selected scheme of each of instances."""
+        (p, t) = self.predict(instances)
+        return _choose(p, t, self.costs, self.min_success, self.tie_tolerance)
+
+    def portfolio(self, instances, size=2):
+        """Return a list with the indices in schemes of the parallel fallback portfolio of each of instances."""
+        neighbors = self.neighbors(instances)
+        (p, t) = self._predict(neighbors)
+        selected = _choose(p, t, self.costs, self.min_success, self.tie_tolerance)
+        portfolios = []
+        for i in range(len(selected)):
+            members = [int(selected[i])]
+            success = self.success[neighbors[i]]
+            solved = success[:, selected[i]].copy()
+            while len(members) < min(size, len(self.schemes)):
+                gains = (success & ~solved[:, None]).sum(axis=0)
+                scheme = min((s for s in range(len(self.schemes)) if s not in members),
+                             key=lambda s: (-gains[s], t[i, s]))
+                members.append(scheme)
+                solved |= success[:, scheme]
+            portfolios.append(members)
+        return portfolios
+
+def train(file_names, problem, time_estimate="time", **options):
+    """Train a selector of problem on stats files. options are passed on to Selector."""
+    (instances, nominal, prb_stats, setup) = load_training(file_names, problem, time_estimate)
+    return Selector(instances, prb_stats, nominal, setup, **options)
+
+### Offline evaluation ###
+def _portfolio_run(prb_stats, schemes, members, i):
+    runs = [prb_stats[schemes[s]][i] for s in members]
+    solved = [run for run in runs if run[0] == "Solve_Succeeded"]
+    if len(solved) == 0:
+        return runs[0]
+    return min(solved, key=lambda run: run[3])
+
+def evaluate(instances, prb_stats, nominal=None, setup=None, n_folds=5, portfolio_size=2, **options):
+    """
+    Cross-validate the selector on the instances of a problem and return {strategy: list of (status, iter, cost, time)}
+    for the strategies selector, portfolio and single best.
+    """
+    schemes = sorted(prb_stats)
+    n_runs = min([len(instances)] + [len(prb_stats[scheme]) for scheme in schemes])
+    folds = np.arange(n_runs) % n_folds
+    strategies = {'selector': n_runs*[None], 'portfolio': n_runs*[None], 'single best': n_runs*[None]}
+    for fold in range(n_folds):
+        train_idxs = np.nonzero(folds != fold)[0]
+        test_idxs = np.nonzero(folds == fold)[0]
+        train_instances = [instances[i] for i in train_idxs]
+        test_instances = [instances[i] for i in test_idxs]
+        train_stats = dict((scheme, [prb_stats[scheme][i] for i in train_idxs]) for scheme in schemes)
+        selector = Selector(train_instances, train_stats, nominal, setup, **options)
+        single_options = dict(options, n_neighbors=None)
+        single_best = Selector(train_instances, train_stats, nominal, setup, **single_options)
+        for (strategy, choices) in [('selector', selector.select(test_instances)),
+                                    ('single best', single_best.select(test_instances))]:
+            for (i, s) in zip(test_idxs, choices):
+                strategies[strategy][i] = prb_stats[schemes[s]][i]
+        for (i, members) in zip(test_idxs, selector.portfolio(test_instances, portfolio_size)):
+            strategies['portfolio'][i] = _portfolio_run(prb_stats, schemes, members, i)
+    return strategies
+
+def virtual_best_ratios(prb_stats, strategies):
+    """
+    Return (r, n_p) as performance_profile.performance_ratios, with the ratios of strategies relative to the virtual
+    best scheme of prb_stats.
+    """
+    schemes = sorted(prb_stats)
+    n_runs = min(len(runs) for runs in list(prb_stats.values()) + list(strategies.values()))
+    r = dict((strategy, []) for strategy in strategies)
+    n_p = 0
+    for i in range(n_runs):
+        times = [prb_stats[scheme][i][3] for scheme in schemes if prb_stats[scheme][i][0] == "Solve_Succeeded"]
+        if len(times) == 0:
+            continue
+        n_p += 1
+        t_best = min(times)
+        for strategy in strategies:
+            run = strategies[strategy][i]
+            r[strategy].append(run[3] / t_best if run[0] == "Solve_Succeeded" else np.inf)
+    return (dict((strategy, np.array(ratios)) for (strategy, ratios) in r.items()), n_p)
+
+def print_gaps(problem, r, n_p):
+    """Print the success rate, the virtual best hit rate and the geometric mean gap of each strategy."""
+    print("\n%s (%d instances solved by some scheme)\n----------------------------" % (problem, n_p))
+    print('%-12s %8s %8s %10s' % ("Strategy", "Success", "Best", "Gap"))
+    for strategy in sorted(r):
+        ratios = r[strategy]
+        solved = np.isfinite(ratios)
+        gap = np.exp(np.mean(np.log(ratios[solved]))) - 1. if solved.any() else np.nan
+        print('%-12s %7.1f%% %7.1f%% %9.1f%%' % (strategy, 100.*solved.mean(), 100.*(ratios <= 1.).mean(), 100*gap))
+
+if __name__ == "__main__":
+    import performance_profile as pp
+    options = {'n_neighbors': n_neighbors, 'min_success': min_success, 'tie_tolerance': tie_tolerance,
+               'distance_weight': distance_weight}
+    r = {}
+    n_p = 0
+    for problem in sorted(stats_files):
+        (instances, nominal, prb_stats, setup) = load_training(stats_files[problem], problem, time_estimate)
+        strategies = evaluate(instances, prb_stats, nominal, setup, n_folds, portfolio_size, **options)
+        (prb_r, prb_n_p) = virtual_best_ratios(prb_stats, strategies)
+        print_gaps(problem, prb_r, prb_n_p)
+        for strategy in prb_r:
+            r[strategy] = np.concatenate([r.get(strategy, np.zeros(0)), prb_r[strategy]])
+        n_p += prb_n_p
+    strategies = ['selector', 'portfolio', 'single best']
+    print("\nrho(tau) relative to the virtual best scheme")
+    print('%-12s' % "Strategy" + "".join(' %8s' % ('%g' % tau) for tau in report_taus))
+    report = pp.rho_curves(r, n_p, strategies, np.array(report_taus))
+    for strategy in strategies:
+        print('%-12s' % strategy + "".join(' %8.3f' % value for value in report[strategy]))
+    taus = np.logspace(0, 1, 100)
+    labels = ['Selector', 'Portfolio of %d' % portfolio_size, 'Single best scheme']
+    pp.plot_curves(taus, pp.rho_curves(r, n_p, strategies, taus), strategies, labels, ['b', 'g', 'r'],
+                   ['-', '--', ':'], title="Gap to the virtual best scheme")
+    import matplotlib.pyplot as plt
+    plt.show()
@@ -0,0 +1,347 @@
+"""
+Indexed database of the runs in the stats files generated by benchmark.py, based on SQLite.
+
+Merging stats files deduplicates their runs by problem, standard deviation, option set, backend, scheme and instance,
+keeping the run of the most recent file. The problem, standard deviation and timestamp are parsed from the file name,
+stats_<problem>_<100*std_dev>[_<tag>][_<timestamp>], and the option set and backend from the extras. The runs can then
+be queried, exported to a stats file or loaded for the performance profiles without reading the stats files again, as
+process_stats.py does with --db.
+
+Usage:
+    python stats_db.py merge stats.db stats/stats_dist_30*
+    python stats_db.py query stats.db --problem dist --scheme 0 1 --status Solve_Succeeded --max-time 10
+    python stats_db.py export stats.db --problem dist --out stats/stats_dist_30_merged
+    python stats_db.py profile stats.db --problem car ccpp dist --instances 0-499
+"""
+
+######################################################## Setup #########################################################
+# Keys of the problems in stats files that differ from the problem names of benchmark.py
+problem_aliases = {'vehicle': 'car', 'dist4': 'dist'}
+########################################################################################################################
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import stats_io
+
+stats_file_pattern = re.compile(r'^stats_(?P<problem>.+?)_(?P<std_dev>\d+)(?:_(?P<tag>[A-Za-z][A-Za-z0-9]*))?'
+                                r'(?:_(?P<timestamp>\d+))?$')
+
+run_columns = ['problem', 'std_dev', 'options', 'backend', 'scheme', 'instance', 'status', 'iter', 'cost', 'time',
+               'time_min', 'time_median', 'timestamp', 'file']
+key_columns = ['problem', 'std_dev', 'options', 'backend', 'scheme', 'instance']
+
+schema_version = 2 # Increase when the schema or the meaning of its columns changes
+
+schema = """
+CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, mtime REAL, n_runs INTEGER);
+CREATE TABLE IF NOT EXISTS runs (problem TEXT, std_dev INTEGER, options TEXT, backend TEXT, scheme TEXT,
+                                 instance INTEGER, status TEXT, iter INTEGER, cost REAL, time REAL, time_min REAL,
+                                 time_median REAL, timestamp INTEGER, file TEXT,
+                                 PRIMARY KEY (problem, std_dev, options, backend, scheme, instance));
+CREATE INDEX IF NOT EXISTS runs_status ON runs (problem, scheme, status);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (problem, time);
+CREATE TABLE IF NOT EXISTS setup (problem TEXT, std_dev INTEGER, options TEXT, backend TEXT, scheme TEXT, info TEXT,
+                                  timestamp INTEGER, PRIMARY KEY (problem, std_dev, options, backend, scheme));
+"""
+
+def connect(db_file):
+    connection = sqlite3.connect(db_file)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    n_tables = connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+    if n_tables > 0 and version != schema_version:
+        connection.close()
+        raise ValueError("Database %s has an older schema, merge the stats files into a new database." % db_file)
+    connection.executescript(schema)
+    connection.execute("PRAGMA user_version = %d" % schema_version)
+    return connection
+
+def parse_file_name(file_name):
+    """
+    Return a dict with the problem, std_dev (in percent), tag (or '') and timestamp (or 0) of a stats file name, or
+    None if it does not follow the naming of benchmark.py or is the name of an extras file.
+    """
+    match = stats_file_pattern.match(os.path.basename(file_name))
+    if match is None or file_name.endswith(stats_io.extras_suffix):
+        return None
+    return {'problem': match.group('problem'),
+            'std_dev': int(match.group('std_dev')),
+            'tag': match.group('tag') or '',
+            'timestamp': int(match.group('timestamp') or 0)}
+
+def options_key(options):
+    """Return the value of the options column for the IPOPT options of a stats file, '' for the default options."""
+    return ", ".join('%s=%s' % (name, options[name]) for name in sorted(options))
+
+def problem_key(stats, problem):
+    """Return the key of problem in stats, accounting for problem_aliases."""
+    for key in stats:
+        if problem_aliases.get(key, key) == problem:
+            return key
+    if len(stats) == 1:
+        return list(stats.keys())[0]
+    return None
+
+def _run_rows(prb_stats, prb_runs, values):
+    rows = []
+    for scheme in prb_stats:
+        runs = prb_runs.get(scheme, [])
+        for (i, (status, iter, cost, time)) in enumerate(prb_stats[scheme]):
+            run = runs[i] if i < len(runs) and runs[i] is not None else {}
+            row = dict(values, scheme=scheme, instance=i, status=status, iter=iter, cost=cost, time=time,
+                       time_min=run.get('time_min'), time_median=run.get('time_median'))
+            rows.append(tuple(row[column] for column in run_columns))
+    return rows
+
+def merge_file(connection, file_name):
+    """
+    Merge the runs of the problem of a stats file into the database and return their number, or None if the file was
+    skipped because it is already merged or not a stats file.
+    """
+    info = parse_file_name(file_name)
+    if info is None:
+        return None
+    mtime = os.path.getmtime(file_name)
+    merged = connection.execute("SELECT mtime FROM files WHERE file = ?", (file_name,)).fetchone()
+    if merged is not None and merged[0] >= mtime:
+        return None
+    stats = stats_io.read_stats(file_name)
+    extras = stats_io.read_extras(file_name)
+    key = problem_key(stats, info['problem'])
+    if key is None:
+        return None
+    options = options_key(extras['options'])
+    values = {'problem': info['problem'], 'std_dev': info['std_dev'], 'options': options,
+              'backend': extras['backend'], 'timestamp': info['timestamp'], 'file': file_name}
+    rows = _run_rows(stats[key], extras['runs'].get(key, {}), values)
+    with connection:
+        connection.executemany("INSERT OR IGNORE INTO runs VALUES (%s)" % ", ".join(len(run_columns)*["?"]), rows)
+        updated = [column for column in run_columns if column not in key_columns]
+        sets = ", ".join(column + " = ?" for column in updated)
+        conditions = " AND ".join(column + " = ?" for column in key_columns)
+        connection.executemany(
+                "UPDATE runs SET %s WHERE %s AND timestamp <= ?" % (sets, conditions),
+                [tuple(row[run_columns.index(column)] for column in updated + key_columns) + (info['timestamp'],)
+                 for row in rows])
+        for (scheme, setup) in extras['setup'].get(key, {}).items():
+            setup_key = (info['problem'], info['std_dev'], options, extras['backend'], scheme)
+            setup_row = setup_key + (json.dumps(setup, default=float), info['timestamp'])
+            connection.execute("INSERT OR IGNORE INTO setup VALUES (?, ?, ?, ?, ?, ?, ?)", setup_row)
+            connection.execute("UPDATE setup SET info = ?, timestamp = ? WHERE problem = ? AND std_dev = ? AND " +
+                               "options = ? AND backend = ? AND scheme = ? AND timestamp <= ?",
+                               setup_row[5:] + setup_key + (info['timestamp'],))
+        connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (file_name, mtime, len(rows)))
+    return len(rows)
+
+def merge(connection, file_names):
+    """Merge the stats files in file_names into the database, oldest first, and return the number of merged files."""
+    file_names = [file_name for file_name in file_names if parse_file_name(file_name) is not None]
+    file_names.sort(key=lambda file_name: parse_file_name(file_name)['timestamp'])
+    n_merged = 0
+    for file_name in file_names:
+        if merge_file(connection, file_name) is not None:
+            n_merged += 1
+    return n_merged
+
+def parse_instances(spec):
+    """Parse an instance set such as "0-99,150" (inclusive ranges) into a sorted list of instance indices."""
+    instances = set()
+    for part in spec.split(','):
+        if '-' in part:
+            (first, last) = part.split('-')
+            instances.update(range(int(first), int(last) + 1))
+        elif part.strip() != '':
+            instances.add(int(part))
+    return sorted(instances)
+
+def query(connection, problems=None, schemes=None, statuses=None, min_time=None, max_time=None, instances=None,
+          std_dev=None, options=None, backend=None):
+    """
+    Return the runs matching all the given filters as a list of dicts with the keys of run_columns, ordered by
+    problem, scheme and instance. Filters that are None are not applied.
+    """
+    conditions = []
+    parameters = []
+    for (column, values) in [('problem', problems), ('scheme', schemes), ('status', statuses),
+                             ('instance', instances)]:
+        if values is not None:
+            values = list(values)
+            conditions.append("%s IN (%s)" % (column, ", ".join(len(values)*["?"])))
+            parameters += values
+    for (condition, value) in [("time >= ?", min_time), ("time <= ?", max_time), ("std_dev = ?", std_dev),
+                               ("options = ?", options), ("backend = ?", backend)]:
+        if value is not None:
+            conditions.append(condition)
+            parameters.append(value)
+    sql = "SELECT %s FROM runs" % ", ".join(run_columns)
+    if len(conditions) > 0:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY problem, scheme, instance"
+    return [dict(zip(run_columns, row)) for row in connection.execute(sql, parameters)]
+
+def setup_infos(connection, problem, std_dev=None, options='', backend=None):
+    """Return the setup information of the schemes of problem as {scheme: info}."""
+    sql = "SELECT scheme, info FROM setup WHERE problem = ? AND options = ?"
+    parameters = [problem, options]
+    for (column, value) in [('std_dev', std_dev), ('backend', backend)]:
+        if value is not None:
+            sql += " AND %s = ?" % column
+            parameters.append(value)
+    return dict((scheme, json.loads(info)) for (scheme, info) in connection.execute(sql, parameters))
+
+def problem_stats(rows, time_estimate="time"):
+    """Build the stats of a single problem, {scheme: list}, from rows, keeping the instances that all schemes have."""
+    schemes = sorted(set(row['scheme'] for row in rows))
+    runs = dict(((row['scheme'], row['instance']), row) for row in rows)
+    instances = sorted(set(row['instance'] for row in rows))
+    instances = [i for i in instances if all((scheme, i) in runs for scheme in schemes)]
+    time_key = 'time' if time_estimate == "time" else stats_io.time_estimates[time_estimate]
+    prb_stats = {}
+    for scheme in schemes:
+        prb_stats[scheme] = []
+        for i in instances:
+            row = runs[(scheme, i)]
+            time = row[time_key] if row[time_key] is not None else row['time']
+            prb_stats[scheme].append((row['status'], row['iter'], row['cost'], time))
+    return prb_stats
+
+def _check_unique(rows):
+    keys = set((row['std_dev'], row['options'], row['backend']) for row in rows)
+    if len(keys) > 1:
+        raise ValueError("Runs with several standard deviations, option sets or backends (%s), filter by std_dev, "
+                         "options and backend." % ", ".join('%d/%s/%s' % key for key in sorted(keys)))
+
+def statses(connection, problems, time_estimate="time", amortize_setup=None, **filters):
+    """
+    Return the stats of problems, filtered as in query, as {problem: {scheme: list}}. Each problem must be left with a
+    single standard deviation, option set and backend.
+    """
+    result = {}
+    for problem in problems:
+        rows = query(connection, problems=[problem], **filters)
+        _check_unique(rows)
+        prb_stats = problem_stats(rows, time_estimate)
+        if len(rows) > 0:
+            setup = setup_infos(connection, problem, rows[0]['std_dev'], rows[0]['options'], rows[0]['backend'])
+            prb_stats = stats_io.amortized_stats(prb_stats, setup, amortize_setup)
+        result[problem] = stats_io.drop_lost(prb_stats)
+    return result
+
+def export(connection, problem, file_name, **filters):
+    """Write the runs of problem, filtered as in query, to a stats file with extras, and return the number of runs."""
+    rows = query(connection, problems=[problem], **filters)
+    _check_unique(rows)
+    stats = {problem: problem_stats(rows)}
+    extras = stats_io.new_extras()
+    runs = dict(((row['scheme'], row['instance']), row) for row in rows)
+    instances = sorted(set(instance for (scheme, instance) in runs))
+    instances = [i for i in instances if all((scheme, i) in runs for scheme in stats[problem])]
+    extras['runs'][problem] = {}
+    for scheme in stats[problem]:
+        extras['runs'][problem][scheme] = []
+        for i in instances:
+            row = runs[(scheme, i)]
+            run = None
+            if row['time_median'] is not None:
+                run = {'time_min': row['time_min'], 'time_median': row['time_median']}
+            extras['runs'][problem][scheme].append(run)
+    if len(rows) > 0:
+        extras['setup'][problem] = setup_infos(connection, problem, rows[0]['std_dev'], rows[0]['options'],
+                                               rows[0]['backend'])
+        extras['backend'] = rows[0]['backend']
+    stats_io.write_stats(file_name, stats, extras)
+    return len(instances)*len(stats[problem])
+
+def print_runs(rows):
+    print('%-16s %4s %-6s %-9s %-6s %5s %-30s %6s %12s %10s' %
+          ("Problem", "Std", "Opts", "Backend", "Scheme", "Inst", "Status", "Iter", "Cost", "Time [s]"))
+    for row in rows:
+        print('%-16s %4d %-6s %-9s %-6s %5d %-30s %6d %12.4e %10.3f' %
+              (row['problem'], row['std_dev'], row['options'], row['backend'], row['scheme'], row['instance'],
+               row['status'], row['iter'], row['cost'], row['time']))
+
+def print_summary(rows):
+    """Print the number of runs, success rate and median successful time per problem and scheme."""
+    import numpy as np
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['problem'], row['std_dev'], row['options'], row['backend'], row['scheme']),
+                          []).append(row)
+    print('%-16s %4s %-6s %-9s %-6s %7s %8s %10s' %
+          ("Problem", "Std", "Opts", "Backend", "Scheme", "Runs", "Success", "Time [s]"))
+    for key in sorted(groups):
+        group = groups[key]
+        times = [row['time'] for row in group if row['status'] == "Solve_Succeeded"]
+        print('%-16s %4d %-6s %-9s %-6s %7d %7.1f%% %10.3f' %
+              (key + (len(group), 100.*len(times)/len(group), np.median(times) if times else float('nan'))))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indexed database of benchmark.py stats files.")
+    subparsers = parser.add_subparsers(dest='command')
+    merge_parser = subparsers.add_parser('merge', help="merge stats files into the database")
+    merge_parser.add_argument('db')
+    merge_parser.add_argument('files', nargs='+')
+    query_parser = subparsers.add_parser('query', help="print the runs matching the filters")
+    export_parser = subparsers.add_parser('export', help="write the runs of a problem to a stats file")
+    profile_parser = subparsers.add_parser('profile', help="plot the performance profile of the runs")
+    for sub_parser in [query_parser, export_parser, profile_parser]:
+        sub_parser.add_argument('db')
+        sub_parser.add_argument('--problem', nargs='+', default=None)
+        sub_parser.add_argument('--scheme', nargs='+', default=None)
+        sub_parser.add_argument('--status', nargs='+', default=None)
+        sub_parser.add_argument('--min-time', type=float, default=None)
+        sub_parser.add_argument('--max-time', type=float, default=None)
+        sub_parser.add_argument('--instances', type=parse_instances, default=None, help="for example 0-99,150")
+        sub_parser.add_argument('--std-dev', type=int, default=None, help="in percent, as in the stats file names")
+        sub_parser.add_argument('--options', default=None,
+                                help="option set, as in 'max_iter=100, mu_init=0.1', or '' for the default options")
+        sub_parser.add_argument('--backend', default=None, help="backend that solved the runs, such as jmodelica")
+    query_parser.add_argument('--summary', action='store_true', help="print counts per scheme instead of runs")
+    export_parser.add_argument('--out', required=True)
+    profile_parser.add_argument('--time-estimate', default="time")
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+
+    connection = connect(args.db)
+    if args.command == 'merge':
+        n_merged = merge(connection, args.files)
+        n_runs = connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        print('Merged %d stats files, the database now has %d runs.' % (n_merged, n_runs))
+        return
+    filters = {'schemes': args.scheme, 'statuses': args.status, 'min_time': args.min_time,
+               'max_time': args.max_time, 'instances': args.instances, 'std_dev': args.std_dev,
+               'options': args.options, 'backend': args.backend}
+    if args.command == 'query':
+        rows = query(connection, problems=args.problem, **filters)
+        if args.summary:
+            print_summary(rows)
+        else:
+            print_runs(rows)
+    elif args.command == 'export':
+        if args.problem is None or len(args.problem) != 1:
+            parser.error("export requires a single --problem")
+        n_runs = export(connection, args.problem[0], args.out, **filters)
+        print('Exported %d runs to %s.' % (n_runs, args.out))
+    elif args.command == 'profile':
+        import matplotlib.pyplot as plt
+        import performance_profile as pp
+        problems = args.problem
+        if problems is None:
+            problems = [row[0] for row in connection.execute("SELECT DISTINCT problem FROM runs")]
+        prb_statses = statses(connection, problems, args.time_estimate, **filters)
+        if args.scheme is None:
+            pp.add_scheme_equalities(prb_statses)
+        idxs = [i for i in pp.scheme_idxs if all(pp.schemes[i] in prb_statses[problem] for problem in problems)]
+        (r, n_p) = pp.performance_ratios(prb_statses, [pp.schemes[i] for i in idxs])
+        scheme_colors = pp.get_scheme_colors()
+        pp.plot_profile(r, n_p, [pp.schemes[i] for i in idxs], [pp.scheme_labels[i] for i in idxs],
+                        [scheme_colors[i] for i in idxs], [pp.scheme_styles[i] for i in idxs], pp.n_tau)
+        plt.show()
+
+if __name__ == "__main__":
+    main()
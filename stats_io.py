@@ -0,0 +1,109 @@
+"""
+Reading and writing of the stats files generated by benchmark.py.
+
+A stats file is a pickled dict {problem: {scheme: [(status, iter, cost, time), ...]}}, with one entry per instance.
+Additional data is stored in a pickled extras file with the suffix _extras next to it, with the keys:
+    runs: {problem: {scheme: [run dict or None, ...]}}, aligned with the stats lists
+    dispersion: {problem: {scheme: median relative run-to-run dispersion of the solution time}}
+    setup: {problem: {scheme: times, peak memory and system sizes of the setup phases}}
+    options: {IPOPT option: value} overriding the default IPOPT options in all runs
+    std_dev: standard deviation of the perturbations, only for the levels of the perturbation sweep
+    instances: {problem: [x0, ...]}, the applied initial state of each instance (see benchmark.applied_state)
+    nominal: {problem: x0}, the applied nominal initial state
+    backend: the backend that solved the runs, comma-separated if several, "jmodelica" if missing
+"""
+
+import os
+import pickle
+
+extras_suffix = "_extras"
+
+# Keys of the robust solution time estimates stored for each run
+time_estimates = {"min": "time_min", "median": "time_median"}
+
+# Statuses of runs without a solver outcome, such as tasks given up by distributed.py. The analyses leave out the
+# instances with such runs.
+lost_statuses = ["Worker_Lost"]
+
+def read_stats(file_name):
+    return pickle.load(open(file_name, "rb"))
+
+def new_extras():
+    return {'runs': {}, 'dispersion': {}, 'setup': {}, 'options': {}, 'instances': {}, 'nominal': {}, 'backend': None}
+
+def add_backend(extras, backend):
+    """Record in extras that backend solved some of its runs."""
+    backends = set(extras['backend'].split(", ")) if extras['backend'] else set()
+    extras['backend'] = ", ".join(sorted(backends | set([backend])))
+
+def read_extras(file_name):
+    """Read the extras belonging to the stats file file_name, or return empty extras if there are none."""
+    extras = new_extras()
+    extras['backend'] = "jmodelica" # Only JModelica.org solved the runs of files without a recorded backend
+    extras_file_name = file_name + extras_suffix
+    if os.path.exists(extras_file_name):
+        extras.update(pickle.load(open(extras_file_name, "rb")))
+    return extras
+
+def write_stats(file_name, stats, extras=None):
+    pickle.dump(stats, open(file_name, "wb"))
+    if extras is not None:
+        pickle.dump(extras, open(file_name + extras_suffix, "wb"))
+
+def align_extras(extras, stats):
+    """Pad or truncate the runs of extras with None so that they are aligned with the lists in stats."""
+    for problem in stats:
+        problem_runs = extras['runs'].setdefault(problem, {})
+        for scheme in stats[problem]:
+            runs = problem_runs.setdefault(scheme, [])
+            n_runs = len(stats[problem][scheme])
+            runs.extend((n_runs - len(runs)) * [None])
+            del runs[n_runs:]
+    return extras
+
+def robust_stats(prb_stats, prb_runs, estimate):
+    """Return the stats of a single problem with the time of each run replaced by the estimate, where available."""
+    if estimate == "time":
+        return prb_stats
+    key = time_estimates[estimate]
+    new_stats = {}
+    for scheme in prb_stats:
+        runs = prb_runs.get(scheme, [])
+        new_stats[scheme] = []
+        for (i, (status, iter, cost, time)) in enumerate(prb_stats[scheme]):
+            if i < len(runs) and runs[i] is not None and key in runs[i]:
+                time = runs[i][key]
+            new_stats[scheme].append((status, iter, cost, time))
+    return new_stats
+
+def lost_instances(prb_stats):
+    """Return the set of instances of a single problem where some scheme has a run with a status in lost_statuses."""
+    return set(i for runs in prb_stats.values() for (i, run) in enumerate(runs) if run[0] in lost_statuses)
+
+def drop_lost(prb_stats, lost=None):
+    """
+    Return the stats of a single problem without the instances in lost, by default its lost instances, so that the
+    remaining instances stay aligned between the schemes.
+    """
+    if lost is None:
+        lost = lost_instances(prb_stats)
+    if len(lost) == 0:
+        return prb_stats
+    return dict((scheme, [run for (i, run) in enumerate(runs) if i not in lost])
+                for (scheme, runs) in prb_stats.items())
+
+def amortized_stats(prb_stats, prb_setup, n_solves):
+    """
+    Return the stats of a single problem with the setup time of each scheme amortized over n_solves added to each run.
+    """
+    if n_solves is None:
+        return prb_stats
+    new_stats = {}
+    for scheme in prb_stats:
+        if scheme in prb_setup:
+            setup_time = prb_setup[scheme]['total_time'] / float(n_solves)
+            new_stats[scheme] = [(status, iter, cost, time + setup_time)
+                                 for (status, iter, cost, time) in prb_stats[scheme]]
+        else:
+            new_stats[scheme] = prb_stats[scheme]
+    return new_stats
@@ -0,0 +1,91 @@
+"""
+Relate the NLP structure of each scheme, as recorded by benchmark.py at setup, to its solution cost.
+
+On the instances that all schemes solved, the time per iteration of each scheme is estimated by regressing its solution
+times on its iteration counts, normalized by the nonzeros of the constraint Jacobian and Lagrangian Hessian, and
+regressed on them in log-log scale across the schemes. Only stats files recorded with record_structure in benchmark.py
+can be used.
+"""
+
+######################################################## Setup #########################################################
+# dict with problem: stats_file
+stats_files = {'dist': 'stats/stats_dist_30_0000000000'}
+########################################################################################################################
+
+import numpy as np
+import stats_io
+
+def join_structure(prb_stats, prb_setup):
+    """Join the setup information of each scheme with the iters and times of the instances that all schemes solved."""
+    schemes = [scheme for scheme in prb_stats if scheme in prb_setup]
+    if len(schemes) == 0:
+        return {}
+    n_runs = min(len(prb_stats[scheme]) for scheme in schemes)
+    common = [i for i in range(n_runs) if all(prb_stats[scheme][i][0] == "Solve_Succeeded" for scheme in schemes)]
+    rows = {}
+    for scheme in schemes:
+        row = dict(prb_setup[scheme])
+        row['iters'] = np.array([prb_stats[scheme][i][1] for i in common], dtype=float)
+        row['times'] = np.array([prb_stats[scheme][i][3] for i in common], dtype=float)
+        rows[scheme] = row
+    return rows
+
+def iteration_cost(iters, times):
+    """
+    Fit times = t_fixed + t_iter * iters and return (t_iter, t_fixed, r2), or NaNs with fewer than two iteration counts.
+    """
+    if len(np.unique(iters)) < 2:
+        return (np.nan, np.nan, np.nan)
+    (t_iter, t_fixed) = np.polyfit(iters, times, 1)
+    residuals = times - (t_fixed + t_iter*iters)
+    r2 = 1. - np.sum(residuals**2) / np.sum((times - np.mean(times))**2)
+    return (t_iter, t_fixed, r2)
+
+def structure_table(rows):
+    """Add the iteration cost regression, the total number of nonzeros and the cost per nonzero to each row."""
+    for row in rows.values():
+        (row['t_iter'], row['t_fixed'], row['r2']) = iteration_cost(row['iters'], row['times'])
+        if row.get('nnz_jac') is not None and row.get('nnz_hess') is not None:
+            row['nnz'] = row['nnz_jac'] + row['nnz_hess']
+            row['t_iter_per_nnz'] = row['t_iter'] / row['nnz']
+        else:
+            row['nnz'] = None
+            row['t_iter_per_nnz'] = np.nan
+    return rows
+
+def nnz_regression(rows):
+    """Fit t_iter = c * nnz**p over the schemes in log-log scale and return (p, r2), or NaNs if not possible."""
+    points = [(row['nnz'], row['t_iter']) for row in rows.values()
+              if row['nnz'] is not None and row['nnz'] > 0 and row['t_iter'] > 0]
+    if len(points) < 3:
+        return (np.nan, np.nan)
+    (log_nnz, log_t_iter) = np.log(np.array(points, dtype=float)).T
+    (p, log_c) = np.polyfit(log_nnz, log_t_iter, 1)
+    residuals = log_t_iter - (log_c + p*log_nnz)
+    r2 = 1. - np.sum(residuals**2) / np.sum((log_t_iter - np.mean(log_t_iter))**2)
+    return (p, r2)
+
+def print_structure_table(problem, rows):
+    print("\n" + problem + "\n----------------------------")
+    if len(rows) == 0:
+        print("No NLP structure recorded.")
+        return
+    print("Instances solved by all schemes: %d" % len(list(rows.values())[0]['times']))
+    print('%-6s %8s %8s %9s %9s %6s %6s %7s %8s %10s %10s %10s %6s' %
+          ("Scheme", "n_var", "n_con", "nnz_jac", "nnz_hess", "block", "torn", "iter", "time",
+           "t_iter [s]", "t_fix [s]", "t/nnz [ns]", "R2"))
+    for scheme in sorted(rows):
+        row = rows[scheme]
+        print('%-6s %8s %8s %9s %9s %6s %6s %7.1f %8.3f %10.2e %10.2e %10.2f %6.2f' %
+              (scheme, row.get('n_var'), row.get('n_con'), row.get('nnz_jac'), row.get('nnz_hess'),
+               row.get('max_block'), row.get('max_torn_block'), np.median(row['iters']), np.median(row['times']),
+               row['t_iter'], row['t_fixed'], 1e9*row['t_iter_per_nnz'], row['r2']))
+    (p, r2) = nnz_regression(rows)
+    print("Time per iteration vs nonzeros over schemes: exponent %.2f, R2 %.2f" % (p, r2))
+
+if __name__ == "__main__":
+    for problem in sorted(stats_files):
+        stats = stats_io.read_stats(stats_files[problem])
+        prb_key = list(stats.keys())[0]
+        prb_setup = stats_io.read_extras(stats_files[problem])['setup'].get(prb_key, {})
+        print_structure_table(problem, structure_table(join_structure(stats[prb_key], prb_setup)))
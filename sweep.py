@@ -0,0 +1,100 @@
+"""
+Analyze the stats files generated by the perturbation sweep of benchmark.py.
+
+For each problem and scheme, the success rate and median time of the successful solves are computed at each standard
+deviation of the perturbations. The robust range of a scheme is the largest standard deviation up to which its success
+rate stays at least min_success and its median time within max_slowdown times that at the smallest standard deviation.
+"""
+
+######################################################## Setup #########################################################
+sweep_files = ['stats/stats_dist_10_sweep_0000000000', 'stats/stats_dist_30_sweep_0000000000'] # Sweep files
+time_estimate = "time" # Solution time to use: "time" (first solve), or "min" or "median" of repeated solves
+min_success = 0.9 # Smallest success rate within the robust range
+max_slowdown = 2. # Largest median time, relative to the smallest standard deviation, within the robust range
+########################################################################################################################
+
+import numpy as np
+import stats_io
+import stats_db
+
+def load_levels(file_names, time_estimate="time"):
+    """
+    Load the sweep files and return {problem: {std_dev: {scheme: list}}}, with std_dev from the extras or the file name.
+    """
+    levels = {}
+    for file_name in file_names:
+        stats = stats_io.read_stats(file_name)
+        extras = stats_io.read_extras(file_name)
+        info = stats_db.parse_file_name(file_name)
+        std = extras.get('std_dev', info['std_dev']/100.)
+        for problem in stats:
+            prb_stats = stats_io.robust_stats(stats[problem], extras['runs'].get(problem, {}), time_estimate)
+            levels.setdefault(problem, {})[std] = stats_io.drop_lost(prb_stats)
+    return levels
+
+def sweep_curves(levels):
+    """Return {problem: {scheme: [point, ...]}} with the success rate and median time and iterations at each std_dev."""
+    curves = {}
+    for problem in levels:
+        curves[problem] = {}
+        for std in sorted(levels[problem]):
+            for (scheme, runs) in levels[problem][std].items():
+                success = [run for run in runs if run[0] == "Solve_Succeeded"]
+                point = {'std_dev': std, 'n_runs': len(runs),
+                         'success_rate': float(len(success)) / len(runs) if runs else np.nan,
+                         'time': np.median([run[3] for run in success]) if success else np.nan,
+                         'iter': np.median([run[1] for run in success]) if success else np.nan}
+                curves[problem].setdefault(scheme, []).append(point)
+    return curves
+
+def robust_range(points, min_success=0.9, max_slowdown=2.):
+    """
+    Return the largest std_dev of points (sorted by std_dev) up to which the success rate is at least min_success and
+    the median time is at most max_slowdown times that of the first point, or None if the first point does not qualify.
+    """
+    reference = points[0]['time']
+    largest = None
+    for point in points:
+        if not point['success_rate'] >= min_success or not point['time'] <= max_slowdown*reference:
+            break
+        largest = point['std_dev']
+    return largest
+
+def print_curves(curves, min_success=0.9, max_slowdown=2.):
+    for problem in sorted(curves):
+        print("\n" + problem + "\n----------------------------")
+        stds = [point['std_dev'] for point in list(curves[problem].values())[0]]
+        print('%-8s' % "Scheme" + "".join(' %15s' % ('std %.2f' % std) for std in stds) + ' %8s' % "Robust")
+        for scheme in sorted(curves[problem]):
+            points = curves[problem][scheme]
+            largest = robust_range(points, min_success, max_slowdown)
+            print('%-8s' % scheme +
+                  "".join(' %5.1f%% %7.2fs' % (100*point['success_rate'], point['time']) for point in points) +
+                  ' %8s' % ('%.2f' % largest if largest is not None else '-'))
+    print("\nSuccess rate and median time per standard deviation. Robust: largest standard deviation with at least " +
+          "%d%% success and at most %.1f times the median time at the smallest one." % (100*min_success, max_slowdown))
+
+def plot_curves(curves):
+    import matplotlib.pyplot as plt
+    for problem in sorted(curves):
+        plt.figure(figsize=(12, 9))
+        for scheme in sorted(curves[problem]):
+            points = curves[problem][scheme]
+            stds = [point['std_dev'] for point in points]
+            plt.subplot(2, 1, 1)
+            plt.plot(stds, [100*point['success_rate'] for point in points], 'o-', lw=2, label=scheme)
+            plt.subplot(2, 1, 2)
+            plt.semilogy(stds, [point['time'] for point in points], 'o-', lw=2, label=scheme)
+        plt.subplot(2, 1, 1)
+        plt.title(problem)
+        plt.ylabel('Success rate [%]')
+        plt.legend(loc='lower left')
+        plt.subplot(2, 1, 2)
+        plt.xlabel('Standard deviation of perturbations')
+        plt.ylabel('Median time [s]')
+    plt.show()
+
+if __name__ == "__main__":
+    curves = sweep_curves(load_levels(sweep_files, time_estimate))
+    print_curves(curves, min_success, max_slowdown)
+    plot_curves(curves)
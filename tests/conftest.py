@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts are not a package, so make them importable from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from scipy import stats as sp_stats
+import compare_stats
+
+def _runs(times):
+    return [("Solve_Succeeded", 10, 1., time) if time is not None else ("Maximum_Iterations_Exceeded", 3000, 1., 1.)
+            for time in times]
+
+def test_mcnemar_matches_binomial_test():
+    for (n_lost, n_gained) in [(0, 5), (3, 12), (7, 7), (20, 4)]:
+        expected = sp_stats.binomtest(n_lost, n_lost + n_gained, 0.5).pvalue
+        assert np.isclose(compare_stats.mcnemar(n_lost, n_gained), expected)
+    assert np.allclose(compare_stats.mcnemar([0, 3], [0, 12]), [1., sp_stats.binomtest(3, 15, 0.5).pvalue])
+
+def test_alignment_errors():
+    baseline = {'0': _runs([1., 2.]), '1': _runs([1., 2.])}
+    assert compare_stats.alignment_errors(baseline, baseline, [[0., 1.]], [[0., 1.]]) == []
+    errors = compare_stats.alignment_errors(baseline, {'0': _runs([1.])}, [[0., 1.]], [[0., 2.]])
+    assert errors == ["schemes 1 are not in the candidate", "scheme 0 has 2 baseline runs and 1 candidate runs",
+                      "the instances differ"]
+    with pytest.raises(ValueError):
+        compare_stats.aligned_arrays(baseline, {'0': _runs([1.])})
+
+def test_compare_flags_regressions():
+    times = list(np.linspace(1., 2., 40))
+    baseline = {'0': _runs(times), '1': _runs(times)}
+    candidate = {'0': _runs([1.5*time for time in times]), '1': _runs(times[:20] + 20*[None])}
+    rows = compare_stats.compare(baseline, candidate)
+    assert [row['scheme'] for row in rows] == ['0', '1', None]
+    assert rows[0]['time_regression'] and not rows[0]['success_regression']
+    assert np.isclose(rows[0]['ratio'], 1.5)
+    assert rows[1]['success_regression'] and not rows[1]['time_regression']
+    assert rows[2]['time_regression'] and rows[2]['success_regression']
+    assert not any(row['time_regression'] or row['success_regression']
+                   for row in compare_stats.compare(baseline, baseline))
@@ -0,0 +1,83 @@
+import socket
+import pytest
+import distributed
+
+def _tasks(n_runs=3):
+    stats = {'dist': {'0': [], '1': []}}
+    return distributed.make_tasks(stats, ['dist'], {'dist': ['0', '1']}, n_runs)
+
+def _succeeded(stats=None):
+    return {'stats': stats or ["Solve_Succeeded", 10, 1., 0.5], 'run': None, 'setup': None}
+
+def test_make_tasks_skips_instances_in_stats():
+    stats = {'dist': {'0': [("Solve_Succeeded", 1, 1., 1.)], '1': []}}
+    tasks = distributed.make_tasks(stats, ['dist'], {'dist': ['0', '1']}, 2)
+    assert [task['id'] for task in tasks] == ['dist__1__0', 'dist__0__1', 'dist__1__1']
+
+def test_work_completes_all_tasks(tmpdir):
+    queue = distributed.DirectoryQueue(str(tmpdir))
+    queue.publish(_tasks(), {'run': 1})
+    queue.finish()
+    solver = distributed.FakeTaskSolver(max_time=0., fail_rate=0.)
+    assert distributed.work(queue, 'w', solver, heartbeat_interval=10., poll_interval=0.01)
+    results = queue.collect()
+    assert sorted(result['task']['id'] for result in results) == sorted(task['id'] for task in _tasks())
+    assert all(result['stats'][0] == "Solve_Succeeded" and result['backend'] == "fake" for result in results)
+    assert queue.collect() == []
+
+def test_check_run_refuses_earlier_run(tmpdir):
+    queue = distributed.DirectoryQueue(str(tmpdir))
+    queue.publish(_tasks(), {'run': 1})
+    with pytest.raises(ValueError):
+        distributed.DirectoryQueue(str(tmpdir)).check_run({'run': 1})
+    with pytest.raises(ValueError):
+        distributed.DirectoryQueue(str(tmpdir)).check_run({'run': 2}, resume=True)
+    distributed.DirectoryQueue(str(tmpdir)).check_run({'run': 1}, resume=True)
+
+@pytest.mark.parametrize('board', [False, True])
+def test_reap_reassigns_then_gives_up(tmpdir, board):
+    if board:
+        queue = distributed.TaskBoard(lease_timeout=-1., max_attempts=2)
+    else:
+        queue = distributed.DirectoryQueue(str(tmpdir), lease_timeout=-1., max_attempts=2)
+    queue.publish(_tasks(1)[:1], {'run': 1})
+    task = queue.lease('w1')
+    assert queue.reap() == (1, 0)
+    assert queue.lease('w2')['id'] == task['id']
+    assert queue.reap() == (0, 1)
+    assert queue.lease('w3') is None
+    assert [result['stats'][0] for result in queue.collect()] == ["Worker_Lost"]
+
+@pytest.mark.parametrize('board', [False, True])
+def test_late_result_replaces_worker_lost(tmpdir, board):
+    if board:
+        queue = distributed.TaskBoard(lease_timeout=-1., max_attempts=1)
+    else:
+        queue = distributed.DirectoryQueue(str(tmpdir), lease_timeout=-1., max_attempts=1)
+    queue.publish(_tasks(1)[:1], {'run': 1})
+    task = queue.lease('w')
+    queue.reap()
+    assert [result['stats'][0] for result in queue.collect()] == ["Worker_Lost"]
+    queue.complete(task, 'w', _succeeded())
+    assert [result['stats'][0] for result in queue.collect()] == ["Solve_Succeeded"]
+    queue.complete(task, 'w', _succeeded(["Maximum_CpuTime_Exceeded", 10, 1., 0.5]))
+    assert queue.collect() == []
+
+def test_work_releases_task_on_setup_error(tmpdir):
+    queue = distributed.DirectoryQueue(str(tmpdir))
+    queue.publish(_tasks(1)[:1], {'run': 1})
+
+    def solve_task(task):
+        raise distributed.SetupError("No JModelica.org")
+    assert not distributed.work(queue, 'w', solve_task, heartbeat_interval=10., poll_interval=0.01)
+    assert queue.lease('w2') is not None
+    assert queue.collect() == []
+
+def test_work_drops_undeliverable_result(tmpdir):
+    class ClosedQueue(distributed.DirectoryQueue):
+        def complete(self, task, worker_id, result):
+            raise socket.error("Connection refused")
+    queue = ClosedQueue(str(tmpdir))
+    queue.publish(_tasks(1)[:1], {'run': 1})
+    solver = distributed.FakeTaskSolver(max_time=0., fail_rate=0.)
+    assert distributed.work(queue, 'w', solver, heartbeat_interval=10., poll_interval=0.01)
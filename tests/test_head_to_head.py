@@ -0,0 +1,32 @@
+import numpy as np
+from scipy import stats as sp_stats
+import head_to_head
+
+def _scipy_p_value(diffs):
+    return sp_stats.wilcoxon(diffs, zero_method='wilcox', correction=True, method='approx').pvalue
+
+def test_wilcoxon_matches_scipy():
+    random = np.random.RandomState(0)
+    diffs = [random.normal(0.2, 1., 30),
+             np.round(random.normal(0., 1., 40), 1), # Ties
+             np.concatenate([np.zeros(5), random.normal(-0.5, 1., 20)])] # Zero differences
+    for d in diffs:
+        log_ratios = np.array([[d, -d], [d, d]])
+        common = np.ones(log_ratios.shape, dtype=bool)
+        p_values = head_to_head.wilcoxon_matrix(log_ratios, common)
+        assert np.allclose(p_values, _scipy_p_value(d))
+
+def test_wilcoxon_only_common_instances():
+    d = np.array([0.3, -0.1, 0.5, 0.2, -0.4, 0.7, 0.1, 0.6])
+    common = np.array([True]*6 + [False]*2)
+    p_value = head_to_head.wilcoxon_matrix(np.array([[d]]), np.array([[common]]))[0, 0]
+    assert np.isclose(p_value, _scipy_p_value(d[common]))
+    assert np.isnan(head_to_head.wilcoxon_matrix(np.zeros((1, 1, 4)), np.ones((1, 1, 4), dtype=bool))[0, 0])
+
+def test_head_to_head_counts():
+    times = np.array([[1., 2., np.nan, 1.], [2., 2.05, 1., np.nan]])
+    success = ~np.isnan(times)
+    results = head_to_head.head_to_head(times, success, tie_tolerance=0.05)
+    assert results['wins'][0, 1] == 2 and results['losses'][0, 1] == 1 and results['ties'][0, 1] == 1
+    assert results['n_common'][0, 1] == 2
+    assert np.isclose(results['ratio'][0, 1], np.sqrt(1./2.*2./2.05))
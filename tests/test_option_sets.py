@@ -0,0 +1,43 @@
+import itertools
+import pytest
+import option_sets
+
+factors = [('mu_strategy', ["monotone", "adaptive"]), ('max_iter', [100, 3000]), ('tol', [1e-8, 1e-6]),
+           ('ma57_pivtol', [1e-8, 1e-4])]
+
+def _signs(design):
+    return [[-1 if options[name] == levels[0] else 1 for (name, levels) in factors] for options in design]
+
+def test_full_factorial():
+    design = option_sets.full_factorial([('max_iter', [100, 3000]), ('tol', [1e-8, 1e-6, 1e-4])])
+    assert len(design) == 6
+    assert sorted((options['max_iter'], options['tol']) for options in design) == \
+        sorted(itertools.product([100, 3000], [1e-8, 1e-6, 1e-4]))
+
+def test_fractional_factorial_half_fraction():
+    design = option_sets.fractional_factorial(factors)
+    assert len(design) == 8
+    signs = _signs(design)
+    assert all(row[3] == row[0]*row[1]*row[2] for row in signs)
+    # Balanced and orthogonal: every pair of factors takes every pair of levels equally often
+    for (j, k) in itertools.combinations(range(len(factors)), 2):
+        pairs = [(row[j], row[k]) for row in signs]
+        assert all(pairs.count(pair) == 2 for pair in itertools.product([-1, 1], repeat=2))
+
+def test_fractional_factorial_generators():
+    design = option_sets.fractional_factorial(factors, [[0, 1]])
+    assert len(design) == 8
+    assert all(row[3] == row[0]*row[1] for row in _signs(design))
+    quarter = option_sets.fractional_factorial(factors + [('acceptable_iter', [15, 10000])], [[0, 1], [0, 2]])
+    assert len(quarter) == 8
+    assert len(set(tuple(sorted(options.items())) for options in quarter)) == 8
+
+def test_fractional_factorial_errors():
+    with pytest.raises(ValueError):
+        option_sets.fractional_factorial([('tol', [1e-8, 1e-6, 1e-4]), ('max_iter', [100, 3000])])
+    with pytest.raises(ValueError):
+        option_sets.fractional_factorial(factors[:2], [[0], [1]])
+
+def test_option_set_name():
+    assert option_sets.option_set_name({}) == "default"
+    assert option_sets.option_set_name({'tol': 1e-6, 'max_iter': 100}) == "max_iter=100, tol=1e-06"
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import pytest
+import stats_io
+import stats_db
+
+def _write(directory, name, problem, times, options=None, backend="jmodelica"):
+    file_name = os.path.join(str(directory), name)
+    stats = {problem: {'0': [("Solve_Succeeded", 10, 1., time) for time in times]}}
+    extras = stats_io.new_extras()
+    extras['options'] = options or {}
+    extras['backend'] = backend
+    stats_io.write_stats(file_name, stats, extras)
+    return file_name
+
+def test_parse_file_name():
+    assert stats_db.parse_file_name("stats/stats_dist_30_1500000000") == \
+        {'problem': 'dist', 'std_dev': 30, 'tag': '', 'timestamp': 1500000000}
+    assert stats_db.parse_file_name("stats_double_pendulum_5_sweep_12") == \
+        {'problem': 'double_pendulum', 'std_dev': 5, 'tag': 'sweep', 'timestamp': 12}
+    assert stats_db.parse_file_name("stats_car_10") == {'problem': 'car', 'std_dev': 10, 'tag': '', 'timestamp': 0}
+    assert stats_db.parse_file_name("stats_dist_30_12" + stats_io.extras_suffix) is None
+    assert stats_db.parse_file_name("profile_dist_30_12") is None
+
+def test_options_key():
+    assert stats_db.options_key({}) == ''
+    assert stats_db.options_key({'tol': 1e-6, 'max_iter': 100}) == 'max_iter=100, tol=1e-06'
+
+def test_merge_keeps_newest_runs(tmpdir):
+    connection = stats_db.connect(str(tmpdir.join("stats.db")))
+    old = _write(tmpdir, "stats_dist_30_100", 'dist', [1., 2.])
+    new = _write(tmpdir, "stats_dist_30_200", 'dist', [3.])
+    assert stats_db.merge(connection, [new, old, old + stats_io.extras_suffix]) == 2
+    rows = stats_db.query(connection)
+    assert [(row['instance'], row['time'], row['timestamp']) for row in rows] == [(0, 3., 200), (1, 2., 100)]
+    assert stats_db.merge(connection, [old, new]) == 0
+
+def test_merge_separates_options_and_backends(tmpdir):
+    connection = stats_db.connect(str(tmpdir.join("stats.db")))
+    files = [_write(tmpdir, "stats_dist_30_100", 'dist', [1.]),
+             _write(tmpdir, "stats_dist_30_200", 'dist', [2.], options={'max_iter': 100}),
+             _write(tmpdir, "stats_dist_30_300", 'dist', [3.], backend="replay")]
+    stats_db.merge(connection, files)
+    assert len(stats_db.query(connection)) == 3
+    with pytest.raises(ValueError):
+        stats_db.statses(connection, ['dist'])
+    statses = stats_db.statses(connection, ['dist'], options='', backend="replay")
+    assert [run[3] for run in statses['dist']['0']] == [3.]
+
+def test_connect_refuses_old_schema(tmpdir):
+    db_file = str(tmpdir.join("old.db"))
+    connection = sqlite3.connect(db_file)
+    connection.execute("CREATE TABLE files (file TEXT PRIMARY KEY, mtime REAL, n_runs INTEGER)")
+    connection.commit()
+    connection.close()
+    with pytest.raises(ValueError):
+        stats_db.connect(db_file)
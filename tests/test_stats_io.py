@@ -0,0 +1,45 @@
+import stats_io
+
+nan = float('nan') # A single object, so that equal stats compare equal
+
+def _stats():
+    return {'0': [("Solve_Succeeded", 10, 1., 2.), ("Worker_Lost", 0, nan, nan),
+                  ("Solve_Succeeded", 12, 1., 3.)],
+            '1': [("Solve_Succeeded", 20, 1., 4.), ("Solve_Succeeded", 21, 1., 5.),
+                  ("Maximum_CpuTime_Exceeded", 99, 2., 6.)]}
+
+def test_robust_stats_replaces_recorded_times():
+    runs = {'0': [{'time_min': 1.5, 'time_median': 1.8}, None], '1': []}
+    stats = stats_io.robust_stats(_stats(), runs, "min")
+    assert [run[3] for run in stats['0']][::2] == [1.5, 3.]
+    assert stats['1'] == _stats()['1']
+    assert stats_io.robust_stats(_stats(), runs, "time") == _stats()
+
+def test_drop_lost_keeps_instances_aligned():
+    stats = stats_io.drop_lost(_stats())
+    assert stats_io.lost_instances(_stats()) == set([1])
+    assert [run[1] for run in stats['0']] == [10, 12]
+    assert [run[1] for run in stats['1']] == [20, 99]
+
+def test_drop_lost_given_instances():
+    stats = stats_io.drop_lost(_stats(), set([0, 1]))
+    assert [run[1] for run in stats['1']] == [99]
+    without_lost = stats_io.drop_lost(stats)
+    assert without_lost is stats
+
+def test_align_extras_pads_and_truncates():
+    extras = stats_io.new_extras()
+    extras['runs']['dist'] = {'0': [{'time_min': 1.}, None, None, {'time_min': 2.}]}
+    extras = stats_io.align_extras(extras, {'dist': _stats()})
+    assert extras['runs']['dist']['0'] == [{'time_min': 1.}, None, None]
+    assert extras['runs']['dist']['1'] == [None, None, None]
+
+def test_extras_round_trip(tmpdir):
+    file_name = str(tmpdir.join('stats_dist_30'))
+    extras = stats_io.new_extras()
+    extras['options'] = {'max_iter': 100}
+    stats_io.write_stats(file_name, {'dist': _stats()}, extras)
+    assert repr(stats_io.read_stats(file_name)) == repr({'dist': _stats()})
+    assert stats_io.read_extras(file_name)['options'] == {'max_iter': 100}
+    stats_io.write_stats(file_name + '_old', {'dist': _stats()})
+    assert stats_io.read_extras(file_name + '_old')['backend'] == "jmodelica"